@@ -0,0 +1,125 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseRedirect
+
+from api.cache import short_link_key
+from api.ingredients_index import ingredients_index
+from api.renderers import ORJSONRenderer
+from api.views import RecipesView, RedirectView, TagsView, json_response
+
+# В Django 3.2 нет асинхронного ORM. Горячие ответы отдаются из кеша прямо
+# в цикле событий, а промахи уходят в синхронные представления. Кеш читается
+# в пуле потоков: общий поток соединений с базой в это время свободен.
+# cached_response у представления — попадание в кеш без полной цепочки
+# middleware, см. AsyncViewMiddleware.
+
+
+def accepts_json(request):
+    accept = request.META.get('HTTP_ACCEPT', '*/*')
+    return (
+        request.GET.get('format', 'json') == 'json'
+        and 'text/html' not in accept
+        and ('*/*' in accept or 'application/json' in accept)
+    )
+
+
+def is_anonymous(request):
+    return 'HTTP_AUTHORIZATION' not in request.META
+
+
+@sync_to_async(thread_sensitive=False)
+def get_cached(get_cache_key, *args):
+    return cache.get(get_cache_key(*args))
+
+
+@sync_to_async(thread_sensitive=False)
+def lookup_ingredients(name):
+    if ingredients_index.is_actual():
+        return ingredients_index.lookup(name)
+    return None
+
+
+def sync_view_to_async(view):
+    # Ответ DRF рендерится здесь же, пока запрос ещё в потоке базы.
+    def rendered_view(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    return sync_to_async(rendered_view)
+
+
+def cached_view(view, get_cache_key, is_cacheable, make_response=None):
+    sync_view = sync_view_to_async(view)
+    make_response = make_response or (
+        lambda request, cached: json_response(request, *cached)
+    )
+
+    async def cached_response(request):
+        if request.method == 'GET' and is_cacheable(request):
+            cached = await get_cached(get_cache_key, request)
+            if cached is not None:
+                return make_response(request, cached)
+        return None
+
+    async def async_view(request, *args, **kwargs):
+        # AsyncViewMiddleware уже смотрел в кеш, второй раз не идём.
+        if not getattr(request, 'cache_checked', False):
+            response = await cached_response(request)
+            if response is not None:
+                return response
+        return await sync_view(request, *args, **kwargs)
+
+    async_view.cached_response = cached_response
+    async_view.csrf_exempt = True
+    return async_view
+
+
+def tags_view(view):
+    return cached_view(
+        view,
+        lambda request: TagsView.get_cache_key(),
+        lambda request: not request.GET,
+    )
+
+
+def recipes_view(view):
+    return cached_view(
+        view,
+        RecipesView.get_cache_key,
+        lambda request: is_anonymous(request) and accepts_json(request),
+    )
+
+
+def ingredients_view(view):
+    sync_view = sync_view_to_async(view)
+    search = sync_to_async(ingredients_index.search)
+
+    async def async_view(request, *args, **kwargs):
+        name = request.GET.get('name')
+        if (
+            request.method != 'GET'
+            or name is None
+            or 'search' in request.GET
+            or not accepts_json(request)
+        ):
+            return await sync_view(request, *args, **kwargs)
+        # Перестройка индекса читает базу, её место в общем потоке.
+        result = await lookup_ingredients(name)
+        if result is None:
+            result = await search(name)
+        return HttpResponse(
+            ORJSONRenderer().render(result), content_type='application/json'
+        )
+
+    async_view.csrf_exempt = True
+    return async_view
+
+
+redirect_short_link = cached_view(
+    RedirectView.as_view(),
+    lambda request: short_link_key(request.resolver_match.kwargs['link']),
+    lambda request: True,
+    lambda request, url: HttpResponseRedirect(url),
+)
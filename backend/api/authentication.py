@@ -0,0 +1,80 @@
+from collections import OrderedDict
+from copy import copy
+from threading import Lock
+from time import monotonic
+
+from rest_framework.authentication import TokenAuthentication
+
+from api.cache import bump_version, get_version, is_shared, user_tokens_key
+from api.metrics import histograms
+from foodgram_backend.constant import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL
+
+
+# Пользователи по токенам хранятся в памяти процесса. Выход, смена пароля,
+# правка и удаление пользователя повышают его версию в общем кеше, и его
+# записи у других воркеров перестают считаться действительными. Без общего
+# кеша версии до других воркеров не дойдут, поэтому токены не кешируются.
+class TokenCache:
+    def __init__(self, max_size=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        if not is_shared():
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[1] > monotonic() and entry[0] == (
+            get_version(user_tokens_key(entry[2][0].pk))
+        ):
+            with self.lock:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                self.hits += 1
+            histograms.increment('token_cache_hits')
+            return entry[2]
+        with self.lock:
+            if self.entries.get(key) is entry:
+                self.entries.pop(key, None)
+            self.misses += 1
+        histograms.increment('token_cache_misses')
+        return None
+
+    def set(self, key, user, token):
+        if not is_shared():
+            return
+        version = get_version(user_tokens_key(user.pk))
+        with self.lock:
+            self.entries[key] = (
+                version, monotonic() + self.ttl, (user, token)
+            )
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            for key in [
+                key for key, entry in self.entries.items()
+                if entry[2][0].pk == user_id
+            ]:
+                del self.entries[key]
+        bump_version(user_tokens_key(user_id))
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token)
+            return user, token
+        user, token = cached
+        # Запрос может менять request.user, общий объект отдавать нельзя.
+        return copy(user), token
@@ -0,0 +1,70 @@
+from django.db import transaction
+
+from api import shopping_list
+from api.counters import update_counters_bulk
+from recipes.models import Recipes, ShoppingCart
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+
+
+def user_recipe_ids(queryset, user, recipe_ids):
+    return set(queryset.filter(
+        user=user, recipe_id__in=recipe_ids
+    ).values_list('recipe_id', flat=True))
+
+
+# Массовые вставка и удаление идут в обход сигналов, поэтому счётчики
+# и список покупок обновляются здесь же, в той же транзакции.
+# Пару пользователь-рецепт защищает уникальное ограничение: строку, которую
+# параллельный запрос того же пользователя вставил между проверкой и
+# вставкой, база пропустит, а её двойной учёт поправит reconcile_counters.
+@transaction.atomic
+def add_recipes(model, user, recipe_ids):
+    names = dict(
+        Recipes.objects.filter(pk__in=recipe_ids).values_list('pk', 'name')
+    )
+    present = user_recipe_ids(model.objects, user, recipe_ids)
+    rows = model.objects.bulk_create([
+        model(user=user, recipe_id=pk, name=names[pk] or '')
+        for pk in recipe_ids
+        if pk in names and pk not in present
+    ], ignore_conflicts=True)
+    if rows:
+        update_counters_bulk(model, rows, 1)
+        if model is ShoppingCart:
+            shopping_list.add_recipes([row.recipe_id for row in rows], user.pk)
+    return {
+        pk: NOT_FOUND if pk not in names else EXISTS if pk in present
+        else ADDED
+        for pk in recipe_ids
+    }
+
+
+# Удаляемые строки блокируются: параллельное удаление тех же рецептов
+# дождётся коммита и не вычтет их из счётчиков второй раз.
+@transaction.atomic
+def remove_recipes(model, user, recipe_ids):
+    present = user_recipe_ids(
+        model.objects.select_for_update(), user, recipe_ids
+    )
+    if present:
+        if model is ShoppingCart:
+            shopping_list.remove_recipes(present, user.pk)
+        rows = model.objects.filter(user=user, recipe_id__in=present)
+        rows._raw_delete(rows.db)
+        update_counters_bulk(
+            model, [model(recipe_id=pk) for pk in present], -1
+        )
+    missing = set(recipe_ids) - present
+    found = set(Recipes.objects.filter(pk__in=missing).values_list(
+        'pk', flat=True
+    )) if missing else set()
+    return {
+        pk: REMOVED if pk in present else ABSENT if pk in found
+        else NOT_FOUND
+        for pk in recipe_ids
+    }
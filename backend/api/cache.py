@@ -0,0 +1,40 @@
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+TAGS_RESPONSE = 'tags_response'
+AUTH_TOKENS = 'auth_tokens'
+RECIPES_RESPONSE = 'recipes_response'
+SHORT_LINKS = 'short_links'
+
+
+def is_shared():
+    # Кеш в памяти процесса у каждого воркера свой, версии в нём
+    # не доходят до соседей.
+    return not isinstance(
+        caches[DEFAULT_CACHE_ALIAS], (DummyCache, LocMemCache)
+    )
+
+
+def version_key(name):
+    return f'{name}_version'
+
+
+def get_version(name):
+    return cache.get_or_set(version_key(name), 1, None)
+
+
+def bump_version(name):
+    try:
+        return cache.incr(version_key(name))
+    except ValueError:
+        cache.set(version_key(name), 2, None)
+        return 2
+
+
+def user_tokens_key(user_id):
+    return f'{AUTH_TOKENS}_{user_id}'
+
+
+def short_link_key(code):
+    return f'{SHORT_LINKS}_{code}'
@@ -0,0 +1,65 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipe, Recipes, ShoppingCart
+from users.models import Follow, User
+
+# Модель со счётчиком, поле счётчика, считаемая модель и её внешний ключ.
+COUNTERS = (
+    (Recipes, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (Recipes, 'carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipes, 'author'),
+    (User, 'followers_count', Follow, 'user'),
+    (User, 'following_count', Follow, 'follower'),
+)
+
+
+def not_negative(counter, delta):
+    # Счётчик без пересчёта после деплоя может быть нулём при живых
+    # строках, уход ниже нуля нарушил бы CHECK положительного поля.
+    return {f'{counter}__gte': -delta} if delta < 0 else {}
+
+
+def update_counters(instance, delta):
+    for model, counter, related, field in COUNTERS:
+        if isinstance(instance, related):
+            model.objects.filter(
+                pk=getattr(instance, f'{field}_id'),
+                **not_negative(counter, delta)
+            ).update(**{counter: F(counter) + delta})
+
+
+# Для массовых вставок и удалений в обход сигналов; каждая строка
+# ссылается на свой объект, как рецепты в корзине одного пользователя.
+def update_counters_bulk(related, instances, delta):
+    for model, counter, counted, field in COUNTERS:
+        if counted is related:
+            model.objects.filter(pk__in=[
+                getattr(instance, f'{field}_id') for instance in instances
+            ], **not_negative(counter, delta)).update(
+                **{counter: F(counter) + delta}
+            )
+
+
+def actual_count(related, field):
+    return Coalesce(Subquery(
+        related.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def reconcile_counters(dry_run=False):
+    drift = {}
+    for model, counter, related, field in COUNTERS:
+        stale = model.objects.annotate(
+            actual=actual_count(related, field)
+        ).exclude(**{counter: F('actual')})
+        drift[f'{model.__name__}.{counter}'] = stale.count()
+        if drift[f'{model.__name__}.{counter}'] and not dry_run:
+            model.objects.filter(
+                pk__in=stale.values('pk')
+            ).update(**{counter: actual_count(related, field)})
+    return drift
@@ -0,0 +1,86 @@
+from django.db import connection
+from django.db.models import Q
+
+from foodgram_backend.constant import FEED_BACKFILL_LIMIT, FEED_FANOUT_LIMIT
+from recipes.models import FeedEntry, Recipes
+from users.models import Follow, User
+
+
+def fan_out(recipes_where, follows_where, recipes_params, follows_params):
+    ops = connection.ops
+    feed, follow, recipes, users = (
+        ops.quote_name(model._meta.db_table)
+        for model in (FeedEntry, Follow, Recipes, User)
+    )
+    # В ленту попадают только последние рецепты каждого автора, а авторы
+    # с огромным числом подписчиков читаются напрямую в get_page.
+    sql = (
+        f'{ops.insert_statement(ignore_conflicts=True)} {feed} '
+        '(user_id, recipe_id, author_id, pub_date) '
+        'SELECT follow.follower_id, recipe.id, recipe.author_id, '
+        'recipe.pub_date '
+        f'FROM {follow} follow '
+        'JOIN (SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+        'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+        f') AS position FROM {recipes} '
+        f'WHERE pub_date IS NOT NULL {recipes_where}) recipe '
+        'ON recipe.author_id = follow.user_id '
+        f'JOIN {users} author ON author.id = follow.user_id '
+        'WHERE recipe.position <= %s AND author.followers_count <= %s '
+        f'{follows_where} '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            *recipes_params,
+            FEED_BACKFILL_LIMIT,
+            FEED_FANOUT_LIMIT,
+            *follows_params,
+        ])
+        return cursor.rowcount
+
+
+def add_recipe(recipe):
+    return fan_out('AND id = %s', '', [recipe.pk], [])
+
+
+def add_follow(follow):
+    return fan_out(
+        'AND author_id = %s', 'AND follow.id = %s',
+        [follow.user_id], [follow.pk],
+    )
+
+
+def remove_follow(follow):
+    FeedEntry.objects.filter(
+        user_id=follow.follower_id, author_id=follow.user_id
+    ).delete()
+
+
+def rebuild():
+    FeedEntry.objects.all().delete()
+    return fan_out('', '', [], [])
+
+
+def before(position, id_field):
+    if position is None:
+        return Q()
+    pub_date, pk = position
+    return Q(pub_date__lt=pub_date) | Q(
+        pub_date=pub_date, **{f'{id_field}__lt': pk}
+    )
+
+
+def get_page(user, position, size):
+    entries = list(FeedEntry.objects.filter(
+        before(position, 'recipe_id'), user=user
+    ).order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id'
+    )[:size])
+    celebrities = Follow.objects.filter(
+        follower=user, user__followers_count__gt=FEED_FANOUT_LIMIT
+    ).values('user_id')
+    entries += Recipes.objects.filter(
+        before(position, 'id'), author__in=celebrities
+    ).order_by('-pub_date', '-id').values_list('pub_date', 'id')[:size]
+    return sorted(set(entries), reverse=True)[:size]
@@ -0,0 +1,50 @@
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_fields(value):
+    # 'id,author.username' -> {'id': None, 'author': {'username': None}},
+    # None означает поле целиком.
+    fields = {}
+    for name in value.split(','):
+        path = name.strip().split('.')
+        if not all(path):
+            continue
+        node = fields
+        for part in path[:-1]:
+            if part in node and node[part] is None:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[path[-1]] = None
+    return fields
+
+
+class FieldSelection:
+    # Поля ответа по ?fields= и ?expand=. Связи отдаются объектами, только
+    # если перечислены в expand или выбраны через точку, иначе — id.
+    def __init__(self, fields=None, expand=()):
+        self.fields = fields
+        self.expand = set(expand)
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        if FIELDS_PARAM not in params and EXPAND_PARAM not in params:
+            return None
+        fields = params.get(FIELDS_PARAM)
+        return cls(
+            parse_fields(fields) if fields is not None else None,
+            parse_fields(params.get(EXPAND_PARAM, '')),
+        )
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def nested(self, name):
+        if self.fields and self.fields.get(name):
+            return FieldSelection(self.fields[name])
+        return None
+
+    def expands(self, name):
+        return name in self.expand or self.nested(name) is not None
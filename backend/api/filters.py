@@ -1,8 +1,12 @@
+from django.db.models import Case, IntegerField, When
 from django_filters import (
     filters,
     FilterSet,
     CharFilter,
 )
+from rest_framework.filters import BaseFilterBackend
+
+from api.search import search_index
 
 from recipes.models import Ingredient, Recipes, Tag
 
@@ -48,3 +52,22 @@ class RecipesFilter(FilterSet):
             )
             return recipes
         return args[0]
+
+
+class RecipesSearchFilter(BaseFilterBackend):
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        recipe_ids = search_index.search(query)
+        if not recipe_ids:
+            return queryset.none()
+        return queryset.filter(pk__in=recipe_ids).order_by(Case(
+            *(
+                When(pk=pk, then=position)
+                for position, pk in enumerate(recipe_ids)
+            ),
+            output_field=IntegerField(),
+        ))
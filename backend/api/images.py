@@ -0,0 +1,93 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, JpegImagePlugin
+
+from foodgram_backend.constant import (
+    IMAGE_VARIANTS,
+    IMAGE_VARIANTS_DIR,
+    IMAGE_VARIANTS_QUALITY,
+)
+
+logger = logging.getLogger(__name__)
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS,
+    thread_name_prefix='images',
+)
+
+
+def variant_name(name, variant):
+    path = PurePosixPath(name)
+    return str(
+        path.parent / IMAGE_VARIANTS_DIR / f'{path.stem}_{variant}.webp'
+    )
+
+
+def has_variants(name):
+    return all(
+        default_storage.exists(variant_name(name, variant))
+        for variant in IMAGE_VARIANTS
+    )
+
+
+def encode(image, image_format, **params):
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **params)
+    return ContentFile(buffer.getvalue())
+
+
+def original_params(image):
+    # Без параметров Pillow сохранил бы JPEG с качеством 75, исходные
+    # таблицы квантования сохраняют качество оригинала.
+    if image.format == 'JPEG':
+        return {
+            'qtables': image.quantization,
+            'subsampling': JpegImagePlugin.get_sampling(image),
+        }
+    return {}
+
+
+def replace(name, content):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, content)
+
+
+def process_image(name):
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image_format = image.format
+        image.load()
+    params = original_params(image)
+    image = ImageOps.exif_transpose(image)
+    # Pillow не переносит EXIF и текстовые блоки при повторном
+    # сохранении, поэтому перекодирование удаляет метаданные.
+    replace(name, encode(image, image_format, **params))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert(
+            'RGBA' if 'transparency' in image.info else 'RGB'
+        )
+    for variant, size in IMAGE_VARIANTS.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail(size)
+        replace(
+            variant_name(name, variant),
+            encode(thumbnail, 'WEBP', quality=IMAGE_VARIANTS_QUALITY),
+        )
+
+
+def run_processing(name):
+    try:
+        process_image(name)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+
+
+def schedule_processing(name):
+    transaction.on_commit(lambda: executor.submit(run_processing, name))
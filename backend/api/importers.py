@@ -0,0 +1,118 @@
+import csv
+import json
+import re
+
+from api.cache import TAGS_RESPONSE, bump_version
+from api.ingredients_index import INGREDIENTS_INDEX
+from recipes.models import Ingredient, Tag
+
+READ_CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s*')
+
+
+def iter_json_array(file, chunk_size=READ_CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    buffer, position = '', 0
+    # Что допустимо дальше: '[' в начале, значение или ']' после '[',
+    # только значение после ',', ',' или ']' после значения.
+    expect = 'start'
+    eof = False
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        if position < len(buffer):
+            char = buffer[position]
+            if expect == 'start':
+                if char != '[':
+                    raise ValueError('Ожидается JSON-массив.')
+                expect = 'first'
+                position += 1
+                continue
+            if char == ']' and expect in ('first', 'separator'):
+                return
+            if expect == 'separator':
+                if char != ',':
+                    raise ValueError(
+                        f'Ожидается "," или "]", найдено {char!r}.'
+                    )
+                expect = 'value'
+                position += 1
+                continue
+            if char in ',]':
+                raise ValueError(f'Ожидается значение, найдено {char!r}.')
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # Число на границе куска могло прочитаться не целиком.
+                if end < len(buffer) or eof:
+                    position = end
+                    expect = 'separator'
+                    yield item
+                    continue
+        elif eof:
+            raise ValueError('Неожиданный конец JSON-файла.')
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def read_ingredients(path, file_format=None):
+    file_format = file_format or path.suffix.lstrip('.').lower()
+    with open(path, encoding='utf-8', newline='') as file:
+        if file_format == 'json':
+            for row in iter_json_array(file):
+                yield row['name'].strip(), row['measurement_unit'].strip()
+        elif file_format == 'csv':
+            for row in csv.reader(file):
+                if row:
+                    yield row[0].strip(), row[1].strip()
+        else:
+            raise ValueError(f'Неизвестный формат файла: {file_format}.')
+
+
+def import_ingredients(
+    rows, batch_size, dry_run=False, on_new=None, on_progress=None
+):
+    existing = set(
+        Ingredient.objects.values_list('name', 'measurement_unit')
+    )
+    total = added = 0
+    batch = []
+    for name, measurement_unit in rows:
+        total += 1
+        if (name, measurement_unit) not in existing:
+            existing.add((name, measurement_unit))
+            added += 1
+            if on_new:
+                on_new(name, measurement_unit)
+            batch.append(
+                Ingredient(name=name, measurement_unit=measurement_unit)
+            )
+        if len(batch) >= batch_size:
+            if not dry_run:
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+        if on_progress and total % batch_size == 0:
+            on_progress(total, added)
+    if batch and not dry_run:
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+    if added and not dry_run:
+        bump_version(INGREDIENTS_INDEX)
+    return total, added
+
+
+def import_tags(slugs, dry_run=False):
+    existing = set(
+        Tag.objects.filter(slug__in=slugs).values_list('slug', flat=True)
+    )
+    new = [slug for slug in slugs if slug not in existing]
+    if new and not dry_run:
+        Tag.objects.bulk_create(
+            [Tag(name=slug, slug=slug) for slug in new],
+            ignore_conflicts=True,
+        )
+        bump_version(TAGS_RESPONSE)
+    return new
@@ -0,0 +1,81 @@
+from bisect import bisect_left
+from difflib import SequenceMatcher
+from threading import Lock
+
+from django.conf import settings
+
+from api.cache import get_version
+from recipes.models import Ingredient
+
+INGREDIENTS_INDEX = 'ingredients_index'
+FUZZY_MIN_LENGTH = 3
+FUZZY_CUTOFF = 0.75
+
+
+def normalize(value):
+    return value.casefold().replace('ё', 'е')
+
+
+class IngredientsIndex:
+    def __init__(self):
+        self.lock = Lock()
+        self.version = None
+        self.keys = []
+        self.items = []
+
+    def build(self):
+        entries = sorted(
+            (normalize(name), name, pk, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        return (
+            [key for key, *_ in entries],
+            [
+                {'id': pk, 'name': name, 'measurement_unit': unit}
+                for _, name, pk, unit in entries
+            ],
+        )
+
+    def ensure_actual(self):
+        version = get_version(INGREDIENTS_INDEX)
+        if version == self.version:
+            return
+        with self.lock:
+            if version != self.version:
+                self.keys, self.items = self.build()
+                self.version = version
+
+    def is_actual(self):
+        return get_version(INGREDIENTS_INDEX) == self.version
+
+    def search(self, prefix):
+        self.ensure_actual()
+        return self.lookup(prefix)
+
+    def lookup(self, prefix):
+        keys, items = self.keys, self.items
+        key = normalize(prefix)
+        start = bisect_left(keys, key)
+        end = bisect_left(keys, key + '\U0010ffff', start)
+        result = items[start:end]
+        if (
+            not result
+            and settings.INGREDIENTS_FUZZY_SEARCH
+            and len(key) >= FUZZY_MIN_LENGTH
+        ):
+            result = self.fuzzy_search(key, keys, items)
+        return result
+
+    def fuzzy_search(self, key, keys, items):
+        matcher = SequenceMatcher(b=key)
+        found = []
+        for index, name in enumerate(keys):
+            matcher.set_seq1(name[:len(key)])
+            if matcher.ratio() >= FUZZY_CUTOFF:
+                found.append(items[index])
+        return found
+
+
+ingredients_index = IngredientsIndex()
@@ -1,18 +1,18 @@
-from random import choice, randint
-from json import load
+from random import sample
 
-from django.core.management.base import BaseCommand
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
 
 from recipes.models import (
     Ingredient,
-    Tag,
     Recipes,
     RecipesIngredient,
+    Tag,
 )
 from users.models import User
 
-tags_main = ['111', '222', '333']
 users = {
     "email": 'test@1.ru',
     "username": 'TEST',
@@ -27,58 +27,45 @@ class Command(BaseCommand):
 
     def handle(self, *args, **kwargs):
 
-        with open('./data/ingredients.json') as file:
-            rows = load(file)
-            for k in rows:
-                try:
-                    _, _ = Ingredient.objects.get_or_create(
-                        name=k['name'],
-                        measurement_unit=k['measurement_unit']
-                    )
-                except Exception:
-                    pass
-            for tag in tags_main:
-                try:
-                    _, _ = Tag.objects.get_or_create(
-                        name=tag,
-                        slug=tag
-                    )
-                    print(f'{tag} tags ready')
-                except Exception:
-                    pass
+        call_command('adding', stdout=self.stdout)
 
-        try:
-            value = 1
-            value_rec = 1
-            for c in range(10):
-                user, _ = User.objects.get_or_create(
-                    username=str(value) + users.get('username'),
-                    email=str(value) + users.get('email'),
-                    first_name=str(value) + users.get('first_name'),
-                    last_name=str(value) + users.get('last_name'),
-                    password=make_password(users.get('password')),
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        if len(ingredient_ids) < 2 or not tag_ids:
+            raise CommandError('Нет ингредиентов или тегов для рецептов')
 
-                )
-                value += 1
-                for x in range(6):
-                    tgs_cnt = list(set([choice([1, 2, 3]) for _ in range(3)]))
-                    obj, _ = Recipes.objects.get_or_create(
+        value = 1
+        value_rec = 1
+        for c in range(10):
+            user, _ = User.objects.get_or_create(
+                username=str(value) + users.get('username'),
+                email=str(value) + users.get('email'),
+                first_name=str(value) + users.get('first_name'),
+                last_name=str(value) + users.get('last_name'),
+                defaults={
+                    'password': make_password(users.get('password')),
+                },
+            )
+            value += 1
+            for x in range(6):
+                # Рецепт с ингредиентами — одна транзакция: поиск и похожие
+                # рецепты индексируют его после коммита, уже с составом.
+                with transaction.atomic():
+                    obj, created = Recipes.objects.get_or_create(
                         name=str(value_rec) + ' ТЕСТОВЫЙ рецепт',
                         author=user,
                         text=str(value_rec) + ' TEST TEXT',
                         cooking_time=value,
                     )
-                    recipeingredients_data = []
-                    for ingredient in range(2):
-                        recipeingredients_data.append(RecipesIngredient(
-                            recipe=obj,
-                            ingredient=Ingredient.objects.get(
-                                pk=randint(1, 2000)),
-                            amount=value
-                        ))
-                    RecipesIngredient.objects.bulk_create(
-                        recipeingredients_data)
-                    obj.tags.set(tgs_cnt)
                     value_rec += 1
-        except Exception as e:
-            print(e)
+                    if not created:
+                        continue
+                    RecipesIngredient.objects.bulk_create(
+                        RecipesIngredient(
+                            recipe=obj,
+                            ingredient_id=ingredient_id,
+                            amount=value,
+                        )
+                        for ingredient_id in sample(ingredient_ids, 2)
+                    )
+                    obj.tags.set(sample(tag_ids, min(len(tag_ids), 2)))
@@ -1,35 +1,52 @@
-from json import load
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
-from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 
-from recipes.models import Ingredient, Tag
-from users.models import User
+from api.importers import import_ingredients, import_tags, read_ingredients
 
 tags_main = ['111', '222', '333']
 
 
 class Command(BaseCommand):
-    help = 'Add csv files'
-
-    def handle(self, *args, **kwargs):
-
-        with open('./data/ingredients.json', 'r', encoding='utf-8') as file:
-            rows = load(file)
-            for k in rows:
-                try:
-                    _, _ = Ingredient.objects.get_or_create(
-                        name=k['name'],
-                        measurement_unit=k['measurement_unit']
-                    )
-                except Exception:
-                    pass
-            for tag in tags_main:
-                try:
-                    _, _ = Tag.objects.get_or_create(
-                        name=tag,
-                        slug=tag
-                    )
-                    print(f'{tag} tags ready')
-                except Exception:
-                    pass
+    help = 'Import ingredients and tags from a json or csv file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            type=Path,
+            default=settings.BASE_DIR / 'data' / 'ingredients.json',
+        )
+        parser.add_argument('--format', choices=('json', 'csv'))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        def on_new(name, measurement_unit):
+            if dry_run:
+                self.stdout.write(f'+ {name} ({measurement_unit})')
+
+        def on_progress(total, added):
+            self.stdout.write(
+                f'Обработано строк: {total}, новых ингредиентов: {added}'
+            )
+
+        try:
+            total, added = import_ingredients(
+                read_ingredients(options['path'], options['format']),
+                options['batch_size'],
+                dry_run=dry_run,
+                on_new=on_new,
+                on_progress=on_progress,
+            )
+        except (OSError, ValueError, KeyError, IndexError) as error:
+            raise CommandError(f'Ошибка импорта: {error!r}')
+        for tag in import_tags(tags_main, dry_run=dry_run):
+            self.stdout.write(f'+ тег {tag}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Будет добавлено" if dry_run else "Добавлено"} '
+            f'ингредиентов: {added} из {total}'
+        ))
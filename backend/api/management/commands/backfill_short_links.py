@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import ShortLink
+from recipes.short_links import encode_short_code
+
+
+class Command(BaseCommand):
+    help = 'Fill short link codes for links created before the code column'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        taken = set(
+            ShortLink.objects.exclude(code=None).values_list(
+                'code', flat=True
+            )
+        )
+        links = ShortLink.objects.filter(code=None).order_by('pk')
+        batch = []
+        updated = 0
+        for link in links.iterator(chunk_size=options['batch_size']):
+            code = (link.short_link or '').rstrip('/').rsplit('/', 1)[-1]
+            if not code or code in taken:
+                code = encode_short_code(link.recipe_id)
+            link.code = code
+            taken.add(code)
+            batch.append(link)
+            if len(batch) >= options['batch_size']:
+                ShortLink.objects.bulk_update(batch, ['code'])
+                updated += len(batch)
+                batch = []
+        if batch:
+            ShortLink.objects.bulk_update(batch, ['code'])
+            updated += len(batch)
+        self.stdout.write(f'Обновлено ссылок: {updated}')
@@ -0,0 +1,373 @@
+import asyncio
+import json
+import resource
+from collections import Counter
+from statistics import median, quantiles
+from time import monotonic, perf_counter
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.test import Client
+from django.test.utils import setup_test_environment
+from rest_framework.authtoken.models import Token
+from rest_framework.pagination import Cursor
+from rest_framework.renderers import JSONRenderer
+
+from api.compression import compress
+from api.feed import get_page
+from api.filters import IngredientFilter
+from api.ingredients_index import ingredients_index
+from api.paginators import RecipesCursorPagination
+from api.renderers import ORJSONRenderer
+from api.search import search_index
+from api.serializers import IngredientSerializer
+from foodgram_backend.constant import SEARCH_RESULTS_LIMIT
+from recipes.models import Ingredient, Recipes, ShortLink
+from users.models import Follow, User
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        timings.append(perf_counter() - start)
+    return median(timings) * 1000, max(timings) * 1000
+
+
+def ingredients(command, options):
+    names = list(Ingredient.objects.values_list('name', flat=True)[:200])
+    if not names:
+        raise CommandError('Нет ингредиентов, загрузите их командой adding.')
+    prefixes = [name[:length] for name in names for length in (1, 2, 3)]
+
+    def query_path():
+        for prefix in prefixes:
+            queryset = IngredientFilter(
+                {'name': prefix}, queryset=Ingredient.objects.all()
+            ).qs
+            IngredientSerializer(queryset, many=True).data
+
+    def index_path():
+        for prefix in prefixes:
+            ingredients_index.search(prefix)
+
+    ingredients_index.ensure_actual()
+    for title, func in (('query', query_path), ('index', index_path)):
+        med, worst = measure(func, options['repeat'])
+        command.stdout.write(
+            f'{title:>6}: {len(prefixes)} prefixes, '
+            f'median {med:.2f} ms, max {worst:.2f} ms'
+        )
+
+
+def pagination(command, options):
+    user = User.objects.first()
+    if user is None:
+        raise CommandError('Нет данных, создайте их командой generate_data.')
+    # Анонимные ответы кешируются, со вторым повтором замер перестал бы
+    # зависеть от пагинации.
+    client = Client(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.get_or_create(user=user)[0]}'
+    )
+    limit = options['limit']
+    total = Recipes.objects.count()
+    paginator = RecipesCursorPagination()
+    paginator.base_url = 'http://testserver/api/recipes/'
+    depth = 0
+    while depth < total:
+        pub_date, pk = Recipes.objects.values_list('pub_date', 'pk')[depth]
+        urls = (
+            ('page', f'/api/recipes/?page={depth // limit + 1}'
+                     f'&limit={limit}'),
+            ('cursor', paginator.encode_cursor(
+                Cursor(
+                    offset=0, reverse=False,
+                    position=f'{pub_date.isoformat()}_{pk}',
+                )
+            ) + f'&limit={limit}'),
+        )
+        for title, url in urls:
+            med, worst = measure(lambda: client.get(url), options['repeat'])
+            command.stdout.write(
+                f'{title:>6}: offset {depth}, '
+                f'median {med:.2f} ms, max {worst:.2f} ms'
+            )
+        depth = depth * 10 or limit * 10
+
+
+def search(command, options):
+    queries = options['queries'] or list(
+        Recipes.objects.exclude(name=None).values_list('name', flat=True)[:20]
+    )
+    if not queries:
+        raise CommandError('Нет рецептов, создайте их командой addiddqd.')
+
+    def query_path():
+        for query in queries:
+            list(Recipes.objects.filter(
+                Q(name__icontains=query)
+                | Q(text__icontains=query)
+                | Q(ingredients__name__icontains=query)
+            ).distinct().values_list('pk', flat=True)[:SEARCH_RESULTS_LIMIT])
+
+    def index_path():
+        for query in queries:
+            search_index.search(query)
+
+    for title, func in (('query', query_path), ('index', index_path)):
+        med, worst = measure(func, options['repeat'])
+        command.stdout.write(
+            f'{title:>6}: {len(queries)} queries over '
+            f'{Recipes.objects.count()} recipes, '
+            f'median {med:.2f} ms, max {worst:.2f} ms'
+        )
+
+
+def feed(command, options):
+    limit = options['limit']
+    # Редкие авторы — худший случай для выборки по всей таблице рецептов.
+    authors = list(User.objects.filter(recipes_count__gt=0).order_by(
+        'recipes_count'
+    ).values_list('pk', flat=True))
+    if not authors:
+        raise CommandError('Нет рецептов, создайте их командой generate_data.')
+    counts = sorted({min(count, len(authors)) for count in (1, 10, 100, 1000)})
+    # Читатели создаются внутри транзакции, которая потом откатывается.
+    with transaction.atomic():
+        for count in counts:
+            reader = User.objects.create(
+                username=f'feed-benchmark-{count}',
+                email=f'feed-benchmark-{count}@example.com',
+            )
+            for author in authors[:count]:
+                Follow.objects.create(user_id=author, follower=reader)
+            client = Client(HTTP_AUTHORIZATION=(
+                f'Token {Token.objects.create(user=reader)}'
+            ))
+
+            def query_path():
+                list(Recipes.objects.filter(
+                    author__following__follower=reader
+                ).values_list('pk', flat=True)[:limit])
+
+            def timeline_path():
+                get_page(reader, None, limit)
+
+            def endpoint_path():
+                client.get(f'/api/recipes/feed/?limit={limit}')
+
+            for title, func in (
+                ('query', query_path),
+                ('feed', timeline_path),
+                ('api', endpoint_path),
+            ):
+                med, worst = measure(func, options['repeat'])
+                command.stdout.write(
+                    f'{title:>6}: follows {count}, '
+                    f'median {med:.2f} ms, max {worst:.2f} ms'
+                )
+        transaction.set_rollback(True)
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    status_line, *lines = head.decode('latin-1').split('\r\n')
+    version, status = status_line.split(' ', 2)[:2]
+    headers = {}
+    for line in lines:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+    if headers.get('transfer-encoding') == 'chunked':
+        size = None
+        while size != 0:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    keep_alive = (
+        version == 'HTTP/1.1' and headers.get('connection') != 'close'
+    )
+    return int(status), keep_alive
+
+
+async def keep_alive_client(address, requests, offset, deadline, stats):
+    reader = writer = None
+    index = offset
+    while monotonic() < deadline:
+        start = perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(*address),
+                    deadline - monotonic()
+                )
+                stats['connects'] += 1
+            writer.write(requests[index % len(requests)])
+            status, keep_alive = await asyncio.wait_for(
+                read_response(reader), deadline - monotonic()
+            )
+        except asyncio.TimeoutError:
+            break
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            stats['errors'] += 1
+            keep_alive = False
+        else:
+            stats['latencies'].append(perf_counter() - start)
+            stats['statuses'][status] += 1
+            index += 1
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def load(url, paths, connections, duration):
+    parts = urlsplit(url)
+    requests = [
+        (
+            f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+            'Accept: application/json\r\n'
+            + ''.join(
+                f'{name}: {value}\r\n' for name, value in headers.items()
+            )
+            + '\r\n'
+        ).encode()
+        for path, headers in paths
+    ]
+    stats = {
+        'statuses': Counter(), 'latencies': [], 'errors': 0, 'connects': 0,
+    }
+    deadline = monotonic() + duration
+    await asyncio.gather(*(
+        keep_alive_client(
+            (parts.hostname, parts.port or 80),
+            requests,
+            offset,
+            deadline,
+            stats
+        )
+        for offset in range(connections)
+    ))
+    return stats
+
+
+def concurrency(command, options):
+    recipe = Recipes.objects.values_list('pk', flat=True).first()
+    ingredient = Ingredient.objects.values_list('name', flat=True).first()
+    if recipe is None or ingredient is None:
+        raise CommandError('Нет рецептов, создайте их командой generate_data.')
+    paths = [
+        (path, {}) for path in (
+            '/api/tags/',
+            f'/api/ingredients/?name={quote(ingredient[:2])}',
+            '/api/recipes/',
+            f'/api/recipes/{recipe}/',
+        )
+    ]
+    code = ShortLink.objects.exclude(code=None).values_list(
+        'code', flat=True
+    ).first()
+    if code is not None:
+        paths.append((f'/s/{code}', {}))
+    # Синхронные представления под ASGI проверяются с авторизацией.
+    user = User.objects.filter(shopping_cart__isnull=False).first()
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        paths.append((
+            '/api/recipes/download_shopping_cart/',
+            {'Authorization': f'Token {token}'},
+        ))
+    # Каждому соединению нужен свой файловый дескриптор.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = options['connections'] + 100
+    if hard != resource.RLIM_INFINITY:
+        needed = min(needed, hard)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft, needed), hard))
+    for url in options['servers']:
+        stats = asyncio.run(load(
+            url, paths, options['connections'], options['duration']
+        ))
+        latencies = stats['latencies']
+        percentiles = (
+            quantiles(latencies, n=100) if len(latencies) > 1
+            else [0] * 99
+        )
+        command.stdout.write(
+            f'{url}: {options["connections"]} connections, '
+            f'{len(latencies) / options["duration"]:.0f} req/s, '
+            f'p50 {percentiles[49] * 1000:.1f} ms, '
+            f'p99 {percentiles[98] * 1000:.1f} ms, '
+            f'{stats["connects"]} connects, {stats["errors"]} errors, '
+            f'statuses {dict(stats["statuses"])}'
+        )
+
+
+def render(command, options):
+    user = User.objects.order_by('-following_count').first()
+    if user is None or not user.following_count:
+        raise CommandError('Нет подписок, создайте их командой generate_data.')
+    limit = options['limit']
+    client = Client(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.get_or_create(user=user)[0]}'
+    )
+    urls = (
+        ('recipes', f'/api/recipes/?limit={limit}'),
+        ('subscriptions', f'/api/users/subscriptions/?limit={limit}'),
+    )
+    for title, url in urls:
+        data = json.loads(client.get(url).content)
+        for name, renderer in (
+            ('json', JSONRenderer()),
+            ('orjson', ORJSONRenderer()),
+        ):
+            med, worst = measure(
+                lambda: renderer.render(data), options['repeat']
+            )
+            command.stdout.write(
+                f'{title:>13} {name:>6}: median {med:.3f} ms, '
+                f'max {worst:.3f} ms'
+            )
+        content = ORJSONRenderer().render(data)
+        command.stdout.write(f'{title:>13} {"raw":>6}: {len(content)} bytes')
+        for encoding in ('gzip', 'br'):
+            med, _ = measure(
+                lambda: compress(content, encoding), options['repeat']
+            )
+            command.stdout.write(
+                f'{title:>13} {encoding:>6}: '
+                f'{len(compress(content, encoding))} bytes, '
+                f'median {med:.3f} ms'
+            )
+
+
+TARGETS = {
+    'concurrency': concurrency,
+    'feed': feed,
+    'ingredients': ingredients,
+    'pagination': pagination,
+    'render': render,
+    'search': search,
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark hot code paths against the current database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=TARGETS)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--queries', nargs='*', default=[])
+        parser.add_argument(
+            '--servers', nargs='*', default=['http://127.0.0.1:8000']
+        )
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--duration', type=float, default=10)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        TARGETS[options['target']](self, options)
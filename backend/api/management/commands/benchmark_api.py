@@ -0,0 +1,409 @@
+import json
+import logging
+import tracemalloc
+from base64 import b64encode
+from io import BytesIO, StringIO
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.generate_data import PASSWORD
+from recipes.models import (
+    Ingredient,
+    Recipes,
+    RecipesIngredient,
+    ShoppingCart,
+    Tag,
+)
+from users.models import User
+
+BUDGETS_PATH = settings.BASE_DIR / 'data' / 'benchmark_budgets.json'
+SIZES = {
+    'small': {'users': 200, 'recipes': 2000},
+    'medium': {'users': 1000, 'recipes': 20000},
+    'large': {'users': 10000, 'recipes': 200000},
+}
+TIME_HEADROOM = 3
+MEMORY_HEADROOM = 2
+GATES = {
+    'queries': ('queries',),
+    'all': ('queries', 'time_ms', 'memory_kb'),
+}
+# Рецепт, который удаляется в замере и заново создаётся перед ним.
+DELETED_RECIPE_ID = 10 ** 9
+NEW_USER_EMAIL = 'benchmark-new-user@example.com'
+
+
+def image_data():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 64), 'orange').save(buffer, format='PNG')
+    return f'data:image/png;base64,{b64encode(buffer.getvalue()).decode()}'
+
+
+def create_deleted_recipe(user, ingredient, tag):
+    recipe = Recipes.objects.create(
+        pk=DELETED_RECIPE_ID, author=user, name='Удаляемый рецепт',
+        text='Текст', cooking_time=1,
+    )
+    RecipesIngredient.objects.create(
+        recipe=recipe, ingredient=ingredient, amount=1
+    )
+    recipe.tags.add(tag)
+
+
+def get_endpoints(user, client):
+    recipe = Recipes.objects.filter(author=user).first() or (
+        Recipes.objects.first()
+    )
+    foreign, *others = Recipes.objects.exclude(
+        shopping_cart__user=user
+    ).exclude(favorite_rec__user=user).exclude(author=user)[:11]
+    author = User.objects.exclude(pk=user.pk).exclude(
+        following__follower=user
+    ).first()
+    ingredient = Ingredient.objects.first()
+    tag = Tag.objects.first()
+    link = client.get(f'/api/recipes/{recipe.pk}/get-link/').json()
+    code = link['short-link'].rstrip('/').rsplit('/', 1)[-1]
+    own = Recipes.objects.filter(author=user).exclude(
+        pk=DELETED_RECIPE_ID
+    ).first()
+    other = User.objects.exclude(pk=user.pk).exclude(pk=author.pk).first()
+    logout_client = Client()
+
+    def login_other():
+        token, _ = Token.objects.get_or_create(user=other)
+        logout_client.defaults['HTTP_AUTHORIZATION'] = f'Token {token}'
+
+    recipe_data = {
+        'ingredients': [{'id': ingredient.pk, 'amount': 10}],
+        'tags': [tag.pk],
+        'image': image_data(),
+        'name': 'Новый рецепт',
+        'text': 'Текст',
+        'cooking_time': 5,
+    }
+    avatar = {'avatar': image_data()}
+    favorite = f'/api/recipes/{foreign.pk}/favorite/'
+    cart = f'/api/recipes/{foreign.pk}/shopping_cart/'
+    subscribe = f'/api/users/{author.pk}/subscribe/'
+    batch = {'recipes': [recipe.pk for recipe in others]}
+    return {
+        'users-list': ('get', '/api/users/'),
+        'users-detail': ('get', f'/api/users/{author.pk}/'),
+        'users-me': ('get', '/api/users/me/'),
+        'subscriptions': (
+            'get', '/api/users/subscriptions/?limit=6&recipes_limit=3'
+        ),
+        'subscribe': ('post', subscribe, {'cleanup': ('delete', subscribe)}),
+        'unsubscribe': ('delete', subscribe, {'setup': ('post', subscribe)}),
+        'tags-list': ('get', '/api/tags/'),
+        'tags-detail': ('get', f'/api/tags/{tag.pk}/'),
+        'ingredients-list': ('get', '/api/ingredients/'),
+        'ingredients-search': (
+            'get', f'/api/ingredients/?name={ingredient.name[:2]}'
+        ),
+        'ingredients-detail': ('get', f'/api/ingredients/{ingredient.pk}/'),
+        'recipes-list': ('get', '/api/recipes/'),
+        'recipes-list-deep': ('get', '/api/recipes/?page=100'),
+        'recipes-list-cursor': ('get', '/api/recipes/?pagination=cursor'),
+        'recipes-list-compact': (
+            'get', '/api/recipes/?fields=id,name,image,cooking_time'
+        ),
+        'recipes-list-ids': (
+            'get', '/api/recipes/?fields=id,name,author,tags,ingredients'
+        ),
+        'recipes-filter-tags': ('get', f'/api/recipes/?tags={tag.slug}'),
+        'recipes-filter-author': (
+            'get', f'/api/recipes/?author={recipe.author_id}'
+        ),
+        'recipes-filter-favorited': ('get', '/api/recipes/?is_favorited=1'),
+        'recipes-filter-cart': (
+            'get', '/api/recipes/?is_in_shopping_cart=1'
+        ),
+        'recipes-search': ('get', '/api/recipes/?search=суп'),
+        'recipes-feed': ('get', '/api/recipes/feed/'),
+        'recipes-detail': ('get', f'/api/recipes/{recipe.pk}/'),
+        'recipes-similar': ('get', f'/api/recipes/{recipe.pk}/similar/'),
+        'recipes-get-link': ('get', f'/api/recipes/{recipe.pk}/get-link/'),
+        'short-link-redirect': ('get', f'/s/{code}'),
+        'favorite-add': ('post', favorite, {'cleanup': ('delete', favorite)}),
+        'favorite-remove': ('delete', favorite, {'setup': ('post', favorite)}),
+        'cart-add': ('post', cart, {'cleanup': ('delete', cart)}),
+        'cart-remove': ('delete', cart, {'setup': ('post', cart)}),
+        'favorite-batch-add': ('post', '/api/recipes/favorite/', {
+            'data': batch,
+            'cleanup': ('delete', '/api/recipes/favorite/', batch),
+        }),
+        'favorite-batch-remove': ('delete', '/api/recipes/favorite/', {
+            'data': batch,
+            'setup': ('post', '/api/recipes/favorite/', batch),
+        }),
+        'cart-batch-add': ('post', '/api/recipes/shopping_cart/', {
+            'data': batch,
+            'cleanup': ('delete', '/api/recipes/shopping_cart/', batch),
+        }),
+        'cart-batch-remove': ('delete', '/api/recipes/shopping_cart/', {
+            'data': batch,
+            'setup': ('post', '/api/recipes/shopping_cart/', batch),
+        }),
+        'download-shopping-cart': (
+            'get', '/api/recipes/download_shopping_cart/'
+        ),
+        'recipes-create': ('post', '/api/recipes/', {
+            'data': recipe_data,
+            'cleanup': lambda response: call(
+                client, 'delete', f'/api/recipes/{response.json()["id"]}/'
+            ),
+        }),
+        'recipes-update': ('patch', f'/api/recipes/{own.pk}/', {
+            'data': {**recipe_data, 'name': own.name},
+        }),
+        'recipes-delete': ('delete', f'/api/recipes/{DELETED_RECIPE_ID}/', {
+            'setup': lambda: create_deleted_recipe(user, ingredient, tag),
+        }),
+        'users-create': ('post', '/api/users/', {
+            'data': {
+                'email': NEW_USER_EMAIL,
+                'username': 'benchmark-new-user',
+                'first_name': 'Новый',
+                'last_name': 'Пользователь',
+                'password': PASSWORD,
+            },
+            'cleanup': lambda response: User.objects.filter(
+                email=NEW_USER_EMAIL
+            ).delete(),
+        }),
+        'token-login': ('post', '/api/auth/token/login/', {
+            'data': {'email': user.email, 'password': PASSWORD},
+        }),
+        'token-logout': ('post', '/api/auth/token/logout/', {
+            'client': logout_client,
+            'setup': login_other,
+        }),
+        'avatar-set': ('put', '/api/users/me/avatar/', {
+            'data': avatar,
+            'cleanup': ('delete', '/api/users/me/avatar/'),
+        }),
+        'avatar-delete': ('delete', '/api/users/me/avatar/', {
+            'setup': ('put', '/api/users/me/avatar/', avatar),
+        }),
+        'set-password': ('post', '/api/users/set_password/', {
+            'data': {'current_password': PASSWORD, 'new_password': PASSWORD},
+        }),
+    }
+
+
+def call(client, method, url, data=None):
+    if data is None:
+        response = getattr(client, method)(url)
+    else:
+        response = getattr(client, method)(
+            url, data=json.dumps(data), content_type='application/json'
+        )
+    if response.status_code >= 400:
+        raise CommandError(
+            f'{method.upper()} {url}: ответ {response.status_code}'
+        )
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def run_hook(client, hook, response=None):
+    if callable(hook):
+        return hook(response) if response is not None else hook()
+    return call(client, *hook)
+
+
+def measure(client, method, url, hooks, repeat):
+    client = hooks.get('client', client)
+
+    def request():
+        response = call(client, method, url, hooks.get('data'))
+        if 'cleanup' in hooks:
+            cleanup = hooks['cleanup']
+            return lambda: run_hook(client, cleanup, response)
+        return lambda: None
+
+    def setup():
+        if 'setup' in hooks:
+            run_hook(client, hooks['setup'])
+
+    def run():
+        setup()
+        start = perf_counter()
+        cleanup = request()
+        elapsed = perf_counter() - start
+        cleanup()
+        return elapsed
+
+    run()
+    timings = [run() for _ in range(repeat)]
+    setup()
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_query):
+        cleanup = request()
+    cleanup()
+    setup()
+    tracemalloc.start()
+    cleanup = request()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cleanup()
+    return {
+        'queries': len(queries),
+        'time_ms': round(median(timings) * 1000, 2),
+        'memory_kb': round(peak / 1024, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Run every API endpoint against generated datasets and check '
+        'query, time and memory budgets'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', choices=SIZES, default=['small', 'medium']
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--only', nargs='*', default=[])
+        parser.add_argument('--update-budgets', action='store_true')
+        # Время и память зависят от машины, на общих раннерах CI
+        # они только выводятся, а проверяется число запросов.
+        parser.add_argument('--gate', choices=GATES, default='all')
+
+    def run_size(self, size, options):
+        # Индекс похожих рецептов и загруженные изображения хранятся
+        # отдельно от рабочих файлов. Кеш общий, как в compose.
+        with TemporaryDirectory() as directory, override_settings(
+            SIMILAR_RECIPES_INDEX=Path(directory) / 'similar_recipes.idx',
+            MEDIA_ROOT=Path(directory) / 'media',
+            CACHES={'default': {
+                'BACKEND': (
+                    'django.core.cache.backends.filebased.FileBasedCache'
+                ),
+                'LOCATION': str(Path(directory) / 'cache'),
+            }},
+        ):
+            return self.measure_size(size, options)
+
+    def measure_size(self, size, options):
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            call_command('flush', interactive=False, verbosity=0)
+            call_command('adding', stdout=StringIO())
+            call_command(
+                'generate_data',
+                users=SIZES[size]['users'],
+                recipes=SIZES[size]['recipes'],
+                stdout=StringIO(),
+            )
+            user = User.objects.order_by('-following_count').first()
+            if not ShoppingCart.objects.filter(user=user).exists():
+                raise CommandError('У пользователя пустая корзина.')
+            client = Client(
+                HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}'
+            )
+            results = {}
+            for name, (method, url, *hooks) in get_endpoints(
+                user, client
+            ).items():
+                if options['only'] and name not in options['only']:
+                    continue
+                results[name] = measure(
+                    client, method, url, hooks[0] if hooks else {},
+                    options['repeat'],
+                )
+                self.stdout.write(
+                    f'{size:>7} {name:<26} '
+                    f'{results[name]["queries"]:>4} queries '
+                    f'{results[name]["time_ms"]:>9.2f} ms '
+                    f'{results[name]["memory_kb"]:>9.1f} KiB'
+                )
+            return results
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def check_budgets(self, measured, gated):
+        budgets = json.loads(BUDGETS_PATH.read_text())
+        failures = []
+        warnings = []
+        for size, results in measured.items():
+            for name, result in results.items():
+                budget = budgets.get(name)
+                if budget is None:
+                    failures.append(f'{name}: нет бюджета')
+                    continue
+                for metric, value in result.items():
+                    limit = budget[metric]
+                    if isinstance(limit, dict):
+                        limit = limit.get(size)
+                    if limit is not None and value > limit:
+                        (failures if metric in gated else warnings).append(
+                            f'{size} {name}: {metric} {value} > {limit}'
+                        )
+        return failures, warnings
+
+    def update_budgets(self, measured):
+        budgets = (
+            json.loads(BUDGETS_PATH.read_text())
+            if BUDGETS_PATH.exists() else {}
+        )
+        for size, results in measured.items():
+            for name, result in results.items():
+                budget = budgets.setdefault(
+                    name, {'queries': 0, 'time_ms': {}, 'memory_kb': {}}
+                )
+                budget['queries'] = result['queries']
+                budget['time_ms'][size] = round(
+                    result['time_ms'] * TIME_HEADROOM + 5
+                )
+                budget['memory_kb'][size] = round(
+                    result['memory_kb'] * MEMORY_HEADROOM + 64
+                )
+        BUDGETS_PATH.write_text(
+            json.dumps(budgets, indent=2, sort_keys=True) + '\n'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        logging.getLogger('api.performance').setLevel(logging.WARNING)
+        measured = {
+            size: self.run_size(size, options) for size in options['sizes']
+        }
+        if options['update_budgets']:
+            self.update_budgets(measured)
+            self.stdout.write(f'Бюджеты записаны в {BUDGETS_PATH}')
+            return
+        failures, warnings = self.check_budgets(
+            measured, GATES[options['gate']]
+        )
+        if warnings:
+            self.stdout.write(self.style.WARNING(
+                'Превышены бюджеты без проверки:\n' + '\n'.join(warnings)
+            ))
+        if failures:
+            raise CommandError(
+                'Превышены бюджеты:\n' + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены.'))
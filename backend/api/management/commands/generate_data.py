@@ -0,0 +1,271 @@
+from itertools import accumulate
+from multiprocessing import Pool
+from random import Random
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+
+from api.cache import RECIPES_RESPONSE, bump_version
+from recipes.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipes,
+    RecipesIngredient,
+    ShoppingCart,
+    Tag,
+)
+from users.models import Follow, User
+
+WORDS = (
+    'суп', 'борщ', 'салат', 'курица', 'говядина', 'картофель', 'рис',
+    'гречка', 'пирог', 'блины', 'сыр', 'томаты', 'грибы', 'запечь',
+    'обжарить', 'сварить', 'нарезать', 'добавить', 'посолить', 'вкусный',
+    'домашний', 'быстрый', 'праздничный', 'острый', 'сладкий', 'овощи',
+)
+PASSWORD = 'generated-password'
+
+state = {}
+
+
+def zipf_cum_weights(size, exponent):
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+def setup(options):
+    connections.close_all()
+    state.clear()
+    state.update(options)
+    state['author_weights'] = zipf_cum_weights(
+        options['users'], options['skew']
+    )
+    state['recipe_weights'] = zipf_cum_weights(
+        options['recipes'], options['skew']
+    )
+    state['ingredient_weights'] = zipf_cum_weights(
+        len(options['ingredient_ids']), options['skew']
+    )
+
+
+def get_random(phase, index):
+    return Random(f'{state["seed"]}-{phase}-{index}')
+
+
+def pick_distinct(rng, population, cum_weights, count, exclude=None):
+    count = min(count, len(population) - (exclude is not None))
+    picked = set()
+    while len(picked) < count:
+        for value in rng.choices(
+            population, cum_weights=cum_weights, k=count - len(picked)
+        ):
+            if value != exclude:
+                picked.add(value)
+    return picked
+
+
+def generate_users(task):
+    index, start, count = task
+    password = state['password_hash']
+    User.objects.bulk_create(
+        [
+            User(
+                pk=pk,
+                username=f'user{pk}',
+                email=f'user{pk}@example.com',
+                first_name=f'Имя{pk}',
+                last_name=f'Фамилия{pk}',
+                password=password,
+            )
+            for pk in range(start, start + count)
+        ],
+        batch_size=state['batch_size'],
+    )
+    return count
+
+
+def generate_recipes(task):
+    index, start, count = task
+    rng = get_random('recipes', index)
+    users = range(state['first_user'], state['first_user'] + state['users'])
+    ingredients = state['ingredient_ids']
+    tags = state['tag_ids']
+    recipes, recipe_ingredients, recipe_tags = [], [], []
+    TagThrough = Recipes.tags.through
+    for pk in range(start, start + count):
+        recipes.append(Recipes(
+            pk=pk,
+            name=f'{rng.choice(WORDS).capitalize()} №{pk}',
+            text=' '.join(rng.choices(WORDS, k=rng.randint(10, 60))),
+            author_id=rng.choices(
+                users, cum_weights=state['author_weights']
+            )[0],
+            cooking_time=rng.randint(5, 180),
+        ))
+        for ingredient_id in pick_distinct(
+            rng, ingredients, state['ingredient_weights'],
+            rng.randint(3, state['max_ingredients']),
+        ):
+            recipe_ingredients.append(RecipesIngredient(
+                recipe_id=pk,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 1000),
+            ))
+        for tag_id in rng.sample(tags, rng.randint(1, min(3, len(tags)))):
+            recipe_tags.append(TagThrough(recipes_id=pk, tag_id=tag_id))
+    with transaction.atomic():
+        Recipes.objects.bulk_create(recipes, batch_size=state['batch_size'])
+        RecipesIngredient.objects.bulk_create(
+            recipe_ingredients, batch_size=state['batch_size']
+        )
+        TagThrough.objects.bulk_create(
+            recipe_tags, batch_size=state['batch_size']
+        )
+    return count
+
+
+def generate_relations(task):
+    index, start, count = task
+    rng = get_random('relations', index)
+    users = range(state['first_user'], state['first_user'] + state['users'])
+    recipes = range(
+        state['first_recipe'], state['first_recipe'] + state['recipes']
+    )
+    follows, favorites, carts = [], [], []
+    for user_id in range(start, start + count):
+        for author_id in pick_distinct(
+            rng, users, state['author_weights'],
+            rng.randint(0, state['follows'] * 2), exclude=user_id,
+        ):
+            follows.append(Follow(user_id=author_id, follower_id=user_id))
+        for model, rows, limit in (
+            (FavoriteRecipe, favorites, state['favorites']),
+            (ShoppingCart, carts, state['cart']),
+        ):
+            for recipe_id in pick_distinct(
+                rng, recipes, state['recipe_weights'],
+                rng.randint(0, limit * 2),
+            ):
+                rows.append(model(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    name=f'Рецепт {recipe_id}',
+                ))
+    with transaction.atomic():
+        for model, rows in (
+            (Follow, follows),
+            (FavoriteRecipe, favorites),
+            (ShoppingCart, carts),
+        ):
+            model.objects.bulk_create(rows, batch_size=state['batch_size'])
+    return count
+
+
+def next_pk(model):
+    return (model.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0) + 1
+
+
+def split(total, start, chunk_size):
+    return [
+        (index, start + offset, min(chunk_size, total - offset))
+        for index, offset in enumerate(range(0, total, chunk_size))
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a deterministic synthetic dataset with bulk inserts '
+        'for load testing'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Average follows per user')
+        parser.add_argument('--favorites', type=int, default=10,
+                            help='Average favorites per user')
+        parser.add_argument('--cart', type=int, default=3,
+                            help='Average shopping cart size per user')
+        parser.add_argument('--max-ingredients', type=int, default=12)
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent of popularity')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--skip-search-index', action='store_true')
+        parser.add_argument('--skip-similar-index', action='store_true')
+
+    def run(self, title, func, tasks, options):
+        start = perf_counter()
+        done = 0
+        if options['workers'] > 1:
+            connections.close_all()
+            with Pool(
+                options['workers'], initializer=setup, initargs=(options,)
+            ) as pool:
+                for count in pool.imap_unordered(func, tasks):
+                    done += count
+                    self.stdout.write(f'{title}: {done}')
+        else:
+            setup(options)
+            for task in tasks:
+                done += func(task)
+                self.stdout.write(f'{title}: {done}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{title}: {done} за {perf_counter() - start:.1f} с'
+        ))
+
+    def handle(self, *args, **options):
+        options['ingredient_ids'] = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        options['tag_ids'] = list(Tag.objects.values_list('pk', flat=True))
+        if not options['ingredient_ids'] or not options['tag_ids']:
+            raise CommandError(
+                'Нет ингредиентов или тегов, загрузите их командой adding.'
+            )
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужно хотя бы два пользователя и один рецепт.')
+        if options['workers'] > 1 and connection.vendor == 'sqlite':
+            raise CommandError(
+                'SQLite не поддерживает параллельную запись, '
+                'используйте --workers 1.'
+            )
+        Random(options['seed']).shuffle(options['ingredient_ids'])
+        options['password_hash'] = make_password(PASSWORD)
+        options['first_user'] = next_pk(User)
+        options['first_recipe'] = next_pk(Recipes)
+        chunk_size = options['chunk_size']
+
+        self.run('Пользователи', generate_users, split(
+            options['users'], options['first_user'], chunk_size
+        ), options)
+        self.run('Рецепты', generate_recipes, split(
+            options['recipes'], options['first_recipe'], chunk_size
+        ), options)
+        self.run('Подписки, избранное и корзины', generate_relations, split(
+            options['users'], options['first_user'], chunk_size
+        ), options)
+
+        connections.close_all()
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [User, Recipes]
+            ):
+                cursor.execute(sql)
+        # Массовые вставки обходят сигналы, счётчики пересчитываются целиком.
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_feed', stdout=self.stdout)
+        call_command('reconcile_shopping_lists', stdout=self.stdout)
+        bump_version(RECIPES_RESPONSE)
+        if not options['skip_search_index']:
+            call_command('search_index', stdout=self.stdout)
+        if not options['skip_similar_index']:
+            call_command('similar_index', stdout=self.stdout)
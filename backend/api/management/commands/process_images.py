@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from api.images import has_variants, process_image
+from recipes.models import Recipes
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Strip metadata and build variants of images uploaded earlier'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true')
+
+    def handle(self, *args, **options):
+        names = set(Recipes.objects.exclude(image='').exclude(
+            image=None
+        ).values_list('image', flat=True))
+        names.update(User.objects.exclude(avatar='').exclude(
+            avatar=None
+        ).values_list('avatar', flat=True))
+        processed = failed = 0
+        for name in sorted(names):
+            if not options['force'] and has_variants(name):
+                continue
+            try:
+                process_image(name)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+                continue
+            processed += 1
+        self.stdout.write(
+            f'Обработано изображений: {processed}, с ошибками: {failed}'
+        )
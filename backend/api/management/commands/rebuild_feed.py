@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.feed import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed subscription feed timelines'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            added = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в ленте: {added}'
+        ))
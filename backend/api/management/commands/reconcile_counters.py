@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized counters and fix the rows that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters(dry_run=options['dry_run'])
+        for name, rows in drift.items():
+            self.stdout.write(f'{name}: расхождений {rows}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Найдено" if options["dry_run"] else "Исправлено"} '
+            f'строк: {sum(drift.values())}'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.shopping_list import reconcile_shopping_lists
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare materialized shopping lists with carts and rebuild '
+        'the lists of users that drifted'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = reconcile_shopping_lists(dry_run=options['dry_run'])
+        for name, rows in drift.items():
+            self.stdout.write(f'{name}: строк {rows}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Найдено" if options["dry_run"] else "Исправлено"} '
+            f'расхождений: {sum(drift.values())}'
+        ))
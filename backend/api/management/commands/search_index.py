@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.search import search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = search_index.rebuild(options['batch_size'])
+        self.stdout.write(f'Проиндексировано рецептов: {total}')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import RECIPES_RESPONSE, bump_version
+from api.similar import similar_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the MinHash index of similar recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--compact',
+            action='store_true',
+            help='Merge pending updates into the index without a rebuild',
+        )
+
+    def handle(self, *args, **options):
+        if options['compact']:
+            similar_index.compact()
+            self.stdout.write('Журнал изменений слит с индексом')
+            return
+        total = similar_index.rebuild(options['batch_size'])
+        # Похожие рецепты кешируются вместе с остальными ответами.
+        bump_version(RECIPES_RESPONSE)
+        self.stdout.write(f'Проиндексировано рецептов: {total}')
@@ -0,0 +1,193 @@
+import logging
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from os import getpid
+from socket import gethostname
+from threading import Lock
+from time import monotonic, perf_counter
+
+from django.core.cache import cache
+
+from foodgram_backend.constant import METRICS_BUCKETS, METRICS_FLUSH_INTERVAL
+
+METRICS_WORKERS = 'metrics_workers'
+METRICS_WORKER = 'metrics_worker'
+
+logger = logging.getLogger(__name__)
+
+flusher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='metrics')
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.durations = {}
+        self.queries = 0
+        self.depth = {}
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0) + seconds
+
+
+@contextmanager
+def timer(name):
+    timings = current_timings.get()
+    # Вложенные сериализаторы уже учтены во внешнем замере.
+    if timings is None or timings.depth.get(name):
+        yield
+        return
+    timings.depth[name] = 1
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.depth[name] = 0
+        timings.add(name, perf_counter() - start)
+
+
+# Стоит на каждом соединении: под ASGI запросы к базе выполняются в другом
+# потоке, а замеры текущего запроса приходят туда через контекст.
+def query_timer(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.add('db', perf_counter() - start)
+
+
+def worker_name():
+    return f'{gethostname()}:{getpid()}'
+
+
+# Гистограммы копятся в процессе, а раз в интервал фоновый поток пишет
+# снимок воркера в его собственный ключ кеша. Ключ пишет только его воркер,
+# поэтому инкременты не теряются и без атомарного incr; /metrics суммирует
+# снимки всех воркеров. Сумма по воркерам получается, только если кеш общий
+# (CACHE_BACKEND, в compose — файловый).
+class Histograms:
+    def __init__(self, worker=None):
+        self.worker = worker
+        self.lock = Lock()
+        self.totals = {}
+        self.counters = {}
+        self.flushed_at = monotonic()
+        self.flushing = False
+
+    def worker_key(self):
+        return f'{METRICS_WORKER}_{self.worker or worker_name()}'
+
+    def increment(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def observe(self, labels, seconds, queries):
+        bucket = bisect_left(METRICS_BUCKETS, seconds)
+        with self.lock:
+            totals = self.totals.setdefault(
+                labels, [0] * (len(METRICS_BUCKETS) + 3)
+            )
+            totals[bucket] += 1
+            totals[-2] += round(seconds * 1_000_000)
+            totals[-1] += queries
+
+    def flush(self):
+        with self.lock:
+            snapshot = {
+                'histograms': {
+                    labels: list(values)
+                    for labels, values in self.totals.items()
+                },
+                'counters': dict(self.counters),
+            }
+            self.flushed_at = monotonic()
+        key = self.worker_key()
+        cache.set(key, snapshot, None)
+        # Реестр могут одновременно менять два воркера, и один ключ
+        # потеряется. Каждый сброс возвращает свой ключ на место.
+        workers = cache.get(METRICS_WORKERS, set())
+        if key not in workers:
+            cache.set(METRICS_WORKERS, workers | {key}, None)
+
+    def is_due(self):
+        return monotonic() - self.flushed_at >= METRICS_FLUSH_INTERVAL
+
+    def flush_if_due(self):
+        with self.lock:
+            if self.flushing or not self.is_due():
+                return
+            self.flushing = True
+        flusher.submit(self.run_flush)
+
+    def run_flush(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Не удалось сбросить метрики в кеш')
+        finally:
+            with self.lock:
+                self.flushing = False
+
+    def collect(self):
+        size = len(METRICS_BUCKETS) + 3
+        totals = {}
+        counters = {}
+        for snapshot in cache.get_many(
+            cache.get(METRICS_WORKERS, set())
+        ).values():
+            for labels, values in snapshot['histograms'].items():
+                summed = totals.setdefault(labels, [0] * size)
+                for index, value in enumerate(values):
+                    summed[index] += value
+            for name, value in snapshot['counters'].items():
+                counters[name] = counters.get(name, 0) + value
+        return totals, counters
+
+    def render(self):
+        self.flush()
+        lines = [
+            '# HELP foodgram_request_duration_seconds '
+            'Request duration by view.',
+            '# TYPE foodgram_request_duration_seconds histogram',
+        ]
+        queries = [
+            '# HELP foodgram_request_queries_total SQL queries by view.',
+            '# TYPE foodgram_request_queries_total counter',
+        ]
+        totals, counters = self.collect()
+        for labels, values in sorted(totals.items()):
+            view, method = labels
+            label = f'view="{view}",method="{method}"'
+            total = 0
+            for bound, value in zip(
+                (*METRICS_BUCKETS, '+Inf'), values[:-2]
+            ):
+                total += value
+                lines.append(
+                    'foodgram_request_duration_seconds_bucket'
+                    f'{{{label},le="{bound}"}} {total}'
+                )
+            lines.append(
+                f'foodgram_request_duration_seconds_sum{{{label}}} '
+                f'{values[-2] / 1_000_000}'
+            )
+            lines.append(
+                f'foodgram_request_duration_seconds_count{{{label}}} {total}'
+            )
+            queries.append(
+                f'foodgram_request_queries_total{{{label}}} {values[-1]}'
+            )
+        counter_lines = []
+        for name, value in sorted(counters.items()):
+            counter_lines.append(f'# TYPE foodgram_{name}_total counter')
+            counter_lines.append(f'foodgram_{name}_total {value}')
+        return '\n'.join(lines + queries + counter_lines) + '\n'
+
+
+histograms = Histograms()
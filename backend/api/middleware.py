@@ -0,0 +1,143 @@
+import asyncio
+import json
+import logging
+from time import perf_counter
+
+from django.middleware.clickjacking import XFrameOptionsMiddleware
+from django.middleware.security import SecurityMiddleware
+from django.urls import Resolver404, resolve
+
+from api.compression import compress_response
+from api.metrics import RequestTimings, current_timings, histograms
+
+logger = logging.getLogger('api.performance')
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # По этому признаку Django вызывает middleware как корутину.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        self.report(request, response, timings, perf_counter() - start)
+        histograms.flush_if_due()
+        return response
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        self.report(request, response, timings, perf_counter() - start)
+        histograms.flush_if_due()
+        return response
+
+    def report(self, request, response, timings, elapsed):
+        timings.add('view', elapsed)
+        durations = {
+            name: round(seconds * 1000, 2)
+            for name, seconds in timings.durations.items()
+        }
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration}' + (
+                f';desc="{timings.queries} queries"' if name == 'db' else ''
+            )
+            for name, duration in durations.items()
+        )
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'queries': timings.queries,
+            **{f'{name}_ms': duration for name, duration in durations.items()},
+        }, ensure_ascii=False))
+        histograms.observe(
+            (view, request.method), timings.durations['view'], timings.queries
+        )
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return compress_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        # Ответы API небольшие: сжать их в цикле событий дешевле,
+        # чем переходить в поток.
+        return compress_response(request, await self.get_response(request))
+
+
+# Под ASGI каждая синхронная middleware — отдельный переход в общий поток.
+# Попадание в кеш асинхронного представления отдаётся в обход остальной
+# цепочки, с её заголовками безопасности. Промахи и прочие запросы проходят
+# всю цепочку как обычно.
+class AsyncViewMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.response_middleware = (
+            SecurityMiddleware(get_response),
+            XFrameOptionsMiddleware(get_response),
+        )
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        response = await self.cached_response(request)
+        if response is None:
+            return await self.get_response(request)
+        for middleware in self.response_middleware:
+            response = middleware.process_response(request, response)
+        return response
+
+    async def cached_response(self, request):
+        if request.method != 'GET':
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        cached_response = getattr(match.func, 'cached_response', None)
+        if cached_response is None:
+            return None
+        request.get_host()
+        request.resolver_match = match
+        response = await cached_response(request)
+        request.cache_checked = True
+        return response
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Таблица полнотекстового поиска своя у каждой СУБД, см. api.search.
+CREATE_SQL = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_search USING fts5('
+        'name, text, ingredients, '
+        "tokenize='unicode61 remove_diacritics 2')",
+    ],
+    'postgresql': [
+        'CREATE TABLE IF NOT EXISTS recipes_search ('
+        'recipe_id bigint PRIMARY KEY '
+        'REFERENCES recipes_recipes(id) ON DELETE CASCADE, '
+        'document tsvector NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS recipes_search_document '
+        'ON recipes_search USING GIN (document)',
+    ],
+}
+DROP_SQL = {
+    'sqlite': ['DROP TABLE IF EXISTS recipes_search'],
+    'postgresql': ['DROP TABLE IF EXISTS recipes_search'],
+}
+
+
+def run_vendor_sql(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(sql)
+    return run
+
+
+create_search_table = run_vendor_sql(CREATE_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '__first__'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, run_vendor_sql(DROP_SQL)),
+    ]
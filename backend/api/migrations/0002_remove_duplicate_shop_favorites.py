@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# Корзина и избранное не наследовали unique_together от ShopFavorite,
+# и в базе могли накопиться повторы пары пользователь-рецепт. Миграции
+# recipes создаются при деплое, а migrate проходит приложения по алфавиту,
+# поэтому повторы удаляются до появления ограничения. Работаем с таблицами
+# как они есть: в новой базе связи с пользователем добавит следующая
+# миграция recipes, и повторов там нет. Счётчики и списки покупок затем
+# пересобирают reconcile_counters и reconcile_shopping_lists.
+TABLES = ('recipes_shoppingcart', 'recipes_favoriterecipe')
+
+
+def remove_duplicates(apps, schema_editor):
+    connection = schema_editor.connection
+    introspection = connection.introspection
+    existing = introspection.table_names()
+    for table in TABLES:
+        if table not in existing:
+            continue
+        with connection.cursor() as cursor:
+            columns = {
+                column.name
+                for column in introspection.get_table_description(
+                    cursor, table
+                )
+            }
+        if not {'user_id', 'recipe_id'} <= columns:
+            continue
+        table = schema_editor.quote_name(table)
+        schema_editor.execute(
+            f'DELETE FROM {table} WHERE id NOT IN ('
+            f'SELECT MIN(id) FROM {table} GROUP BY user_id, recipe_id)'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_recipes_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,20 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+from datetime import datetime
+from operator import attrgetter
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
 from rest_framework.response import Response
 
-from foodgram_backend.constant import PAGE_SIZE
+from api.feed import before
+from foodgram_backend.constant import ADMIN_EXACT_COUNT_LIMIT, PAGE_SIZE
 
 
 class Pagination(PageNumberPagination):
@@ -9,17 +22,86 @@ class Pagination(PageNumberPagination):
     page_size = PAGE_SIZE
 
 
-class LimitRecipesPagination(PageNumberPagination):
-    page_size_query_param = 'recipes_limit'
-    max_page_size = PAGE_SIZE
+class RecipesCursorPagination(CursorPagination):
+    # Курсор хранит (pub_date, id) последней записи страницы, следующая
+    # страница читается по ключу, без OFFSET и без COUNT(*). Рецепты без
+    # даты публикации в такой порядок не встают и пропускаются.
+    page_size_query_param = 'limit'
+    page_size = PAGE_SIZE
+    ordering = ('-pub_date', '-id')
+
+    def decode_position(self, request):
+        cursor = self.decode_cursor(request)
+        if cursor is None:
+            return None
+        try:
+            pub_date, pk = cursor.position.rsplit('_', 1)
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (AttributeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_by_position(self, get_page, request, get_position):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        entries = get_page(self.decode_position(request), self.page_size + 1)
+        self.next_position = None
+        if len(entries) > self.page_size:
+            entries = entries[:self.page_size]
+            self.next_position = get_position(entries[-1])
+        self.display_page_controls = self.next_position is not None
+        return entries
+
+    def paginate_queryset(self, queryset, request, view=None):
+        def get_page(position, size):
+            return list(queryset.filter(
+                before(position, 'id'), pub_date__isnull=False
+            ).order_by(*self.ordering)[:size])
+
+        return self.paginate_by_position(
+            get_page, request, attrgetter('pub_date', 'pk')
+        )
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        pub_date, pk = self.next_position
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False, position=f'{pub_date.isoformat()}_{pk}'
+        ))
+
+    def get_previous_link(self):
+        return None
 
     def get_paginated_response(self, data):
-        recipe_limit = int(self.request.query_params['recipes_limit'])
-        for obj in data:
-            obj['recipes'] = obj['recipes'][:recipe_limit]
-        return Response({
-            'count': self.page.paginator.count,
-            'next': self.get_next_link(),
-            'previous': self.get_previous_link(),
-            'results': data
-        })
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class FeedPagination(RecipesCursorPagination):
+    def paginate_feed(self, get_page, request):
+        entries = self.paginate_by_position(
+            get_page, request, lambda entry: entry
+        )
+        return [pk for _, pk in entries]
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if (
+            hasattr(queryset, 'query')
+            and connections[queryset.db].vendor == 'postgresql'
+        ):
+            # Оценка планировщика вместо COUNT(*) по всей таблице.
+            sql, params = queryset.query.sql_with_params()
+            with connections[queryset.db].cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                estimate = cursor.fetchone()[0][0]['Plan']['Plan Rows']
+            if estimate > ADMIN_EXACT_COUNT_LIMIT:
+                return int(estimate)
+        return super().count
@@ -0,0 +1,128 @@
+from django.db import connection, transaction
+
+from api.stemmer import stem_text
+from foodgram_backend.constant import SEARCH_RESULTS_LIMIT
+from recipes.models import Recipes, RecipesIngredient
+
+
+def get_documents(recipe_ids):
+    ingredients = {}
+    for recipe_id, name in RecipesIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient__name'):
+        ingredients.setdefault(recipe_id, []).append(name)
+    return [
+        (pk, name or '', text or '', ' '.join(ingredients.get(pk, [])))
+        for pk, name, text in Recipes.objects.filter(
+            pk__in=recipe_ids
+        ).values_list('pk', 'name', 'text')
+    ]
+
+
+# Таблицы recipes_search создаёт миграция api 0001_recipes_search.
+class SQLiteSearchBackend:
+    # Веса столбцов для bm25: название, текст, ингредиенты.
+    search_sql = (
+        'SELECT rowid FROM recipes_search WHERE recipes_search MATCH %s '
+        'ORDER BY bm25(recipes_search, 10.0, 1.0, 5.0) LIMIT %s'
+    )
+
+    def prepare(self, value):
+        return ' '.join(stem_text(value))
+
+    def write(self, cursor, documents):
+        cursor.executemany(
+            'INSERT INTO recipes_search(rowid, name, text, ingredients) '
+            'VALUES (%s, %s, %s, %s)',
+            [
+                (pk, *(self.prepare(value) for value in values))
+                for pk, *values in documents
+            ],
+        )
+
+    def delete(self, cursor, recipe_ids):
+        cursor.executemany(
+            'DELETE FROM recipes_search WHERE rowid = %s',
+            [(pk,) for pk in recipe_ids],
+        )
+
+    def search(self, cursor, query):
+        terms = stem_text(query)
+        if not terms:
+            return []
+        cursor.execute(
+            self.search_sql,
+            [' '.join(f'"{term}"*' for term in terms), SEARCH_RESULTS_LIMIT],
+        )
+        return [pk for pk, in cursor.fetchall()]
+
+
+class PostgreSQLSearchBackend:
+    search_sql = (
+        "SELECT recipe_id FROM recipes_search, "
+        "websearch_to_tsquery('russian', %s) query "
+        'WHERE document @@ query '
+        'ORDER BY ts_rank(document, query) DESC LIMIT %s'
+    )
+
+    def write(self, cursor, documents):
+        cursor.executemany(
+            'INSERT INTO recipes_search(recipe_id, document) VALUES (%s, '
+            "setweight(to_tsvector('russian', %s), 'A') || "
+            "setweight(to_tsvector('russian', %s), 'C') || "
+            "setweight(to_tsvector('russian', %s), 'B')) "
+            'ON CONFLICT (recipe_id) DO UPDATE '
+            'SET document = EXCLUDED.document',
+            documents,
+        )
+
+    def delete(self, cursor, recipe_ids):
+        cursor.execute(
+            'DELETE FROM recipes_search WHERE recipe_id = ANY(%s)',
+            [list(recipe_ids)],
+        )
+
+    def search(self, cursor, query):
+        cursor.execute(self.search_sql, [query, SEARCH_RESULTS_LIMIT])
+        return [pk for pk, in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+class RecipesSearchIndex:
+    @property
+    def backend(self):
+        return BACKENDS[connection.vendor]()
+
+    def update(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        backend = self.backend
+        with transaction.atomic(), connection.cursor() as cursor:
+            backend.delete(cursor, recipe_ids)
+            backend.write(cursor, get_documents(recipe_ids))
+
+    # Одной транзакцией: поиск не видит наполовину собранный индекс.
+    @transaction.atomic
+    def rebuild(self, batch_size):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM recipes_search')
+        recipe_ids = list(
+            Recipes.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        for start in range(0, len(recipe_ids), batch_size):
+            self.update(recipe_ids[start:start + batch_size])
+        return len(recipe_ids)
+
+    def search(self, query):
+        with connection.cursor() as cursor:
+            return self.backend.search(cursor, query)
+
+    def schedule_update(self, recipe_id):
+        transaction.on_commit(lambda: self.update([recipe_id]))
+
+
+search_index = RecipesSearchIndex()
@@ -1,12 +1,23 @@
 import base64
+from copy import deepcopy
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from rest_framework import serializers
 
+from api import shopping_list
+from api.images import variant_name
+from api.metrics import timer
+from foodgram_backend.constant import (
+    BATCH_RECIPES_LIMIT,
+    IMAGE_MAX_SIZE,
+    IMAGE_VARIANTS,
+)
 from users.models import User, Follow
 from recipes.models import (
     Ingredient,
@@ -18,19 +29,83 @@ from recipes.models import (
 )
 
 
+class TimedModelSerializer(serializers.ModelSerializer):
+    def to_representation(self, instance):
+        with timer('serialize'):
+            return super().to_representation(instance)
+
+
+class SparseFieldsMixin:
+    # Поля вне выбора убираются, связи без expand заменяются компактными.
+    compact_fields = {}
+
+    def __init__(self, *args, selection=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if selection is None:
+            return
+        for name, field in list(self.fields.items()):
+            nested = selection.nested(name)
+            if not selection.includes(name):
+                self.fields.pop(name)
+            elif nested is not None and isinstance(field, SparseFieldsMixin):
+                self.fields[name] = type(field)(
+                    *field._args, selection=nested, **field._kwargs
+                )
+            elif (
+                name in self.compact_fields
+                and not selection.expands(name)
+            ):
+                self.fields[name] = deepcopy(self.compact_fields[name])
+
+
 class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        'max_size': 'Размер изображения не должен превышать {max_size} Мб.',
+    }
+
+    def check_size(self, size):
+        if size > IMAGE_MAX_SIZE:
+            self.fail('max_size', max_size=IMAGE_MAX_SIZE // 1024 // 1024)
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             form, imgstr = data.split(';base64,')
+            self.check_size(len(imgstr) * 3 // 4)
             ext = form.split('/')[-1]
             data = ContentFile(
                 base64.b64decode(imgstr), name='image.' + ext
             )
+        self.check_size(getattr(data, 'size', 0))
         return super().to_internal_value(data)
 
 
-class UsersSerializer(serializers.ModelSerializer):
+class ImageVariantsField(serializers.Field):
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        variants = {}
+        for variant in IMAGE_VARIANTS:
+            name = variant_name(value.name, variant)
+            # Варианты пишет фоновая обработка, пока их нет — отдаём
+            # оригинал.
+            url = (
+                default_storage.url(name) if default_storage.exists(name)
+                else value.url
+            )
+            variants[variant] = (
+                request.build_absolute_uri(url) if request else url
+            )
+        return variants
+
+
+class UsersSerializer(SparseFieldsMixin, TimedModelSerializer):
     avatar = Base64ImageField(required=False, allow_null=True)
+    avatar_variants = ImageVariantsField(source='avatar')
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -43,6 +118,7 @@ class UsersSerializer(serializers.ModelSerializer):
             'last_name',
             'is_subscribed',
             'avatar',
+            'avatar_variants',
         )
 
     def validate(self, attr):
@@ -52,6 +128,8 @@ class UsersSerializer(serializers.ModelSerializer):
         return attr
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = obj.pk
         rule = (
             self.context.get('subscriber') is None
@@ -71,19 +149,20 @@ class UsersSerializer(serializers.ModelSerializer):
         ).exists()
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedModelSerializer):
     class Meta:
         model = Tag
         fields = '__all__'
 
 
-class FavoriteShoppingSerializer(serializers.ModelSerializer):
+class FavoriteShoppingSerializer(TimedModelSerializer):
     image = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField(source='recipe.image')
     cooking_time = serializers.SerializerMethodField()
 
     class Meta:
         model = ShoppingCart
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_variants', 'cooking_time']
 
     def get_image(self, obj):
         return (f"{settings.SITE_URL}"
@@ -97,16 +176,27 @@ class FavoriteShoppingSerializer(serializers.ModelSerializer):
 class FavoriteSerializer(FavoriteShoppingSerializer):
     class Meta:
         model = FavoriteRecipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_variants', 'cooking_time']
 
 
 class ShoppingSerializer(FavoriteShoppingSerializer):
     class Meta:
         model = ShoppingCart
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_variants', 'cooking_time']
+
+
+class BatchRecipesSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BATCH_RECIPES_LIMIT,
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedModelSerializer):
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
@@ -131,14 +221,30 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         return value
 
 
-class RecipesSerializer(serializers.ModelSerializer):
+class CompactRecipeIngredientSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient_id')
+
+    class Meta:
+        model = RecipesIngredient
+        fields = ('id', 'amount')
+
+
+class RecipesSerializer(SparseFieldsMixin, TimedModelSerializer):
     tags = TagSerializer(many=True)
     author = UsersSerializer(default=serializers.CurrentUserDefault())
     ingredients = RecipeIngredientSerializer(
         many=True, source='recipe_ingredients')
     image = Base64ImageField()
+    image_variants = ImageVariantsField(source='image')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    compact_fields = {
+        'author': serializers.PrimaryKeyRelatedField(read_only=True),
+        'tags': serializers.PrimaryKeyRelatedField(many=True, read_only=True),
+        'ingredients': CompactRecipeIngredientSerializer(
+            many=True, source='recipe_ingredients'
+        ),
+    }
 
     class Meta:
         model = Recipes
@@ -151,12 +257,15 @@ class RecipesSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         ]
         read_only_fields = fields
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user.pk
         recipe = obj.pk
         return FavoriteRecipe.objects.filter(
@@ -164,6 +273,8 @@ class RecipesSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user.pk
         recipe = obj.pk
         return ShoppingCart.objects.filter(
@@ -172,16 +283,14 @@ class RecipesSerializer(serializers.ModelSerializer):
 
 
 class PostRecipeIngredientSerializer(RecipeIngredientSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField()
 
     class Meta:
         model = RecipesIngredient
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipesPostSerializer(serializers.ModelSerializer):
+class RecipesPostSerializer(TimedModelSerializer):
     author = UsersSerializer(default=serializers.CurrentUserDefault())
     image = Base64ImageField(required=True)
     ingredients = PostRecipeIngredientSerializer(
@@ -232,18 +341,7 @@ class RecipesPostSerializer(serializers.ModelSerializer):
                     f'Поле {field} не может быть пустым',
                     code=400
                 )
-        get_ingredient = attrs.get('ingredients')
         get_tag = attrs.get('tags')
-        if get_ingredient:
-            hashed_dicts = len(set(
-                frozenset(d.items()) for d in get_ingredient)
-            )
-
-            if hashed_dicts != len(get_ingredient):
-                raise ValidationError(
-                    'Повторения в поле ingredients',
-                    code=400
-                )
         if get_tag:
             rule_tags = len(get_tag) == len(frozenset(get_tag))
             if not rule_tags:
@@ -253,10 +351,29 @@ class RecipesPostSerializer(serializers.ModelSerializer):
                 )
         return attrs
 
+    def validate_ingredients(self, value):
+        ids = [ingredient['id'] for ingredient in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                'Повторения в поле ingredients'
+            )
+        existing = set(Ingredient.objects.filter(
+            pk__in=ids
+        ).values_list('pk', flat=True))
+        missing = [str(pk) for pk in ids if pk not in existing]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {", ".join(missing)}'
+            )
+        return value
+
     def to_representation(self, instance):
+        request = self.context.get('request')
         return RecipesSerializer(
-            instance=instance,
-            context={'request': self.context.get('request')}
+            instance=Recipes.objects.for_representation(
+                request.user
+            ).get(pk=instance.pk),
+            context={'request': request}
         ).data
 
     def add_tags_ingredients(self, ingredients, tags, model):
@@ -265,12 +382,48 @@ class RecipesPostSerializer(serializers.ModelSerializer):
             recipeingredients_data.append(
                 RecipesIngredient(
                     recipe=model,
-                    ingredient=ingredient['id'],
+                    ingredient_id=ingredient['id'],
                     amount=ingredient['amount'])
             )
         RecipesIngredient.objects.bulk_create(recipeingredients_data)
         model.tags.set(tags)
 
+    def update_ingredients(self, ingredients, model):
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        current = {
+            row.ingredient_id: row for row in model.recipe_ingredients.all()
+        }
+        removed = [
+            row.pk for ingredient_id, row in current.items()
+            if ingredient_id not in amounts
+        ]
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != row.amount:
+                row.amount = amount
+                changed.append(row)
+        added = [
+            RecipesIngredient(
+                recipe=model, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ]
+        if not (removed or changed or added):
+            return
+        with shopping_list.updating(model.pk):
+            if removed:
+                RecipesIngredient.objects.filter(pk__in=removed).delete()
+            if changed:
+                RecipesIngredient.objects.bulk_update(changed, ['amount'])
+            if added:
+                RecipesIngredient.objects.bulk_create(added)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -279,12 +432,12 @@ class RecipesPostSerializer(serializers.ModelSerializer):
         self.add_tags_ingredients(ingredients, tags, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        instance.ingredients.clear()
-        instance.tags.clear()
-        self.add_tags_ingredients(ingredients, tags, instance)
+        self.update_ingredients(ingredients, instance)
+        instance.tags.set(tags)
         return super().update(instance, validated_data)
 
 
@@ -315,22 +468,23 @@ class AuthSerializer(DjoserUserSerializer):
         return user
 
 
-class RecipeForSubcriber(serializers.ModelSerializer):
+class RecipeForSubcriber(TimedModelSerializer):
     id = serializers.IntegerField()
     name = serializers.CharField()
     image = Base64ImageField()
+    image_variants = ImageVariantsField(source='image')
     cooking_time = serializers.IntegerField()
 
     class Meta:
         model = Recipes
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class SubscribeSerializer(UsersSerializer):
     first_name = serializers.CharField(required=False)
     last_name = serializers.CharField(required=False)
     recipes = RecipeForSubcriber(many=True, read_only=True)
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -344,6 +498,7 @@ class SubscribeSerializer(UsersSerializer):
             'recipes',
             'recipes_count',
             'avatar',
+            'avatar_variants',
         )
 
         read_only_fields = ('email', 'username',)
@@ -356,6 +511,3 @@ class SubscribeSerializer(UsersSerializer):
                 {'Ошибка': 'Подписка и отписка на самого себя запрещена.'}
             )
         return data
-
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
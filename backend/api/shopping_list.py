@@ -0,0 +1,172 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+
+from recipes.models import RecipesIngredient, ShoppingCart, ShoppingListItem
+
+REBUILD_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 500
+
+
+def add_items(where, params):
+    ops = connection.ops
+    items, carts, ingredients = (
+        ops.quote_name(model._meta.db_table)
+        for model in (ShoppingListItem, ShoppingCart, RecipesIngredient)
+    )
+    # Строки для пары пользователь-ингредиент складываются с уже
+    # имеющимися, так одна вставка обслуживает и корзину, и пересборку.
+    sql = (
+        f'INSERT INTO {items} '
+        '(user_id, ingredient_id, amount, recipes_count) '
+        'SELECT cart.user_id, ingredient.ingredient_id, '
+        'SUM(ingredient.amount), COUNT(*) '
+        f'FROM {carts} cart JOIN {ingredients} ingredient '
+        'ON ingredient.recipe_id = cart.recipe_id '
+        f'WHERE ingredient.ingredient_id IS NOT NULL {where} '
+        'GROUP BY cart.user_id, ingredient.ingredient_id '
+        'ON CONFLICT (user_id, ingredient_id) DO UPDATE SET '
+        f'amount = {items}.amount + excluded.amount, '
+        f'recipes_count = {items}.recipes_count + excluded.recipes_count'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def holders(recipe_id, user_id=None):
+    carts = ShoppingCart.objects.filter(recipe_id=recipe_id)
+    if user_id is not None:
+        carts = carts.filter(user_id=user_id)
+    return carts.values('user_id')
+
+
+def add_recipe(recipe_id, user_id=None):
+    if user_id is None:
+        return add_items('AND cart.recipe_id = %s', [recipe_id])
+    return add_items(
+        'AND cart.recipe_id = %s AND cart.user_id = %s', [recipe_id, user_id]
+    )
+
+
+def add_recipes(recipe_ids, user_id):
+    return add_items(
+        'AND cart.user_id = %s AND cart.recipe_id IN '
+        f'({", ".join(["%s"] * len(recipe_ids))})',
+        [user_id, *recipe_ids]
+    )
+
+
+def subtract(items, ingredients):
+    totals = ingredients.filter(
+        ingredient_id=OuterRef('ingredient_id')
+    ).order_by().values('ingredient_id')
+    items.update(
+        amount=F('amount') - Subquery(
+            totals.annotate(total=Sum('amount')).values('total')
+        ),
+        recipes_count=F('recipes_count') - Subquery(
+            totals.annotate(total=Count('pk')).values('total')
+        ),
+    )
+    items.filter(recipes_count=0).delete()
+
+
+def remove_recipe(recipe_id, user_id=None):
+    ingredients = RecipesIngredient.objects.filter(recipe_id=recipe_id)
+    subtract(ShoppingListItem.objects.filter(
+        user_id__in=holders(recipe_id, user_id),
+        ingredient_id__in=ingredients.values('ingredient_id'),
+    ), ingredients)
+
+
+# Рецепты из корзины одного пользователя, вызывать до удаления строк.
+def remove_recipes(recipe_ids, user_id):
+    ingredients = RecipesIngredient.objects.filter(
+        recipe_id__in=ShoppingCart.objects.filter(
+            user_id=user_id, recipe_id__in=recipe_ids
+        ).values('recipe_id')
+    )
+    subtract(ShoppingListItem.objects.filter(
+        user_id=user_id,
+        ingredient_id__in=ingredients.values('ingredient_id'),
+    ), ingredients)
+
+
+@contextmanager
+def updating(*recipe_ids):
+    # Вклад рецептов вычитается по старому составу и добавляется по новому.
+    for recipe_id in recipe_ids:
+        remove_recipe(recipe_id)
+    yield
+    for recipe_id in recipe_ids:
+        add_recipe(recipe_id)
+
+
+def rebuild(user_ids=None):
+    if user_ids is None:
+        ShoppingListItem.objects.all().delete()
+        return add_items('', [])
+    added = 0
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), REBUILD_BATCH_SIZE):
+        batch = user_ids[start:start + REBUILD_BATCH_SIZE]
+        ShoppingListItem.objects.filter(user_id__in=batch).delete()
+        added += add_items(
+            f'AND cart.user_id IN ({", ".join(["%s"] * len(batch))})', batch
+        )
+    return added
+
+
+def export_lines(user):
+    # Строки уходят в ответ пачками по мере чтения из базы.
+    lines = []
+    for name, amount, measurement_unit in ShoppingListItem.objects.filter(
+        user=user
+    ).values_list(
+        'ingredient__name',
+        'amount',
+        'ingredient__measurement_unit',
+    ).order_by(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        lines.append(f'{name} {amount} {measurement_unit}\n')
+        if len(lines) == EXPORT_CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def reconcile_shopping_lists(dry_run=False):
+    expected = {
+        (row['user_id'], row['ingredient_id']): (row['total'], row['recipes'])
+        for row in RecipesIngredient.objects.filter(
+            ingredient__isnull=False
+        ).values(
+            'ingredient_id', user_id=F('recipe__shopping_cart__user_id')
+        ).exclude(user_id=None).annotate(
+            total=Sum('amount'), recipes=Count('pk')
+        ).order_by().iterator()
+    }
+    drift = {'missing': 0, 'extra': 0, 'wrong': 0}
+    users = set()
+    for user_id, ingredient_id, amount, recipes_count in (
+        ShoppingListItem.objects.values_list(
+            'user_id', 'ingredient_id', 'amount', 'recipes_count'
+        ).iterator()
+    ):
+        wanted = expected.pop((user_id, ingredient_id), None)
+        if wanted is None:
+            drift['extra'] += 1
+        elif wanted != (amount, recipes_count):
+            drift['wrong'] += 1
+        else:
+            continue
+        users.add(user_id)
+    drift['missing'] = len(expected)
+    users.update(user_id for user_id, _ in expected)
+    if users and not dry_run:
+        rebuild(users)
+    return drift
@@ -0,0 +1,203 @@
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api import feed, shopping_list
+from api.authentication import token_cache
+from api.cache import (
+    RECIPES_RESPONSE,
+    TAGS_RESPONSE,
+    bump_version,
+    short_link_key,
+)
+from api.counters import update_counters
+from api.images import has_variants, schedule_processing
+from api.ingredients_index import INGREDIENTS_INDEX
+from api.metrics import query_timer
+from api.search import search_index
+from api.similar import similar_index
+from recipes.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipes,
+    RecipesIngredient,
+    ShoppingCart,
+    ShortLink,
+    Tag,
+)
+from users.models import Follow, User
+
+
+@receiver(connection_created)
+def install_query_timer(connection, **kwargs):
+    # Первым в списке, чтобы не мешать временным execute_wrapper().
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, query_timer)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients_index(**kwargs):
+    bump_version(INGREDIENTS_INDEX)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags_response(**kwargs):
+    bump_version(TAGS_RESPONSE)
+
+
+def process_uploaded_image(image, update_fields):
+    if update_fields is not None and image.field.name not in update_fields:
+        return
+    if image and not has_variants(image.name):
+        schedule_processing(image.name)
+
+
+@receiver(post_save, sender=Recipes)
+def process_recipe_image(instance, update_fields, **kwargs):
+    process_uploaded_image(instance.image, update_fields)
+
+
+@receiver(post_save, sender=User)
+def process_avatar(instance, update_fields, **kwargs):
+    process_uploaded_image(instance.avatar, update_fields)
+
+
+@receiver((post_save, post_delete), sender=Recipes)
+def update_search_index(instance, **kwargs):
+    search_index.schedule_update(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=RecipesIngredient)
+def update_search_index_ingredients(instance, **kwargs):
+    if instance.recipe_id is not None:
+        search_index.schedule_update(instance.recipe_id)
+
+
+# Раньше сброса кеша ответов: похожие рецепты кешируются вместе с ними.
+@receiver((post_save, post_delete), sender=Recipes)
+def update_similar_index(instance, **kwargs):
+    similar_index.schedule_update(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=RecipesIngredient)
+def update_similar_index_ingredients(instance, **kwargs):
+    if instance.recipe_id is not None:
+        similar_index.schedule_update(instance.recipe_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def update_search_index_ingredient_name(instance, created, **kwargs):
+    if not created:
+        recipe_ids = list(instance.recipes.values_list('pk', flat=True))
+        transaction.on_commit(lambda: search_index.update(recipe_ids))
+
+
+def invalidate_user_tokens(user_id):
+    transaction.on_commit(lambda: token_cache.invalidate(user_id))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(instance, **kwargs):
+    invalidate_user_tokens(instance.user_id)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user_tokens(instance, **kwargs):
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_logged_out_user_tokens(user, **kwargs):
+    if user is not None:
+        invalidate_user_tokens(user.pk)
+
+
+def invalidate_recipes_response():
+    transaction.on_commit(lambda: bump_version(RECIPES_RESPONSE))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_caches(instance, created, update_fields, **kwargs):
+    # Вход обновляет только last_login, кеши от этого не устаревают.
+    # У нового пользователя ещё нет ни токенов, ни рецептов.
+    if created or (
+        update_fields is not None and set(update_fields) == {'last_login'}
+    ):
+        return
+    invalidate_user_tokens(instance.pk)
+    invalidate_recipes_response()
+
+
+@receiver((post_save, post_delete), sender=Recipes)
+@receiver((post_save, post_delete), sender=RecipesIngredient)
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver(post_delete, sender=User)
+def invalidate_recipes_response_on_change(**kwargs):
+    invalidate_recipes_response()
+
+
+@receiver(m2m_changed, sender=Recipes.tags.through)
+def invalidate_recipes_response_on_tags(action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_recipes_response()
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Recipes)
+@receiver(post_save, sender=Follow)
+def increment_counters(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        update_counters(instance, 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Recipes)
+@receiver(post_delete, sender=Follow)
+def decrement_counters(instance, **kwargs):
+    update_counters(instance, -1)
+
+
+@receiver(post_save, sender=Recipes)
+def fan_out_recipe(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.add_recipe(instance)
+
+
+@receiver(post_save, sender=Follow)
+def fan_out_follow(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.add_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_follow_from_feed(instance, **kwargs):
+    feed.remove_follow(instance)
+
+
+@receiver((post_save, post_delete), sender=ShortLink)
+def invalidate_short_link(instance, **kwargs):
+    transaction.on_commit(lambda: cache.delete(short_link_key(instance.code)))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        shopping_list.add_recipe(instance.recipe_id, instance.user_id)
+
+
+# До удаления: при каскаде от рецепта его ингредиенты ещё на месте.
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    shopping_list.remove_recipe(instance.recipe_id, instance.user_id)
@@ -0,0 +1,353 @@
+import fcntl
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from foodgram_backend.constant import (
+    SIMILAR_BANDS,
+    SIMILAR_DELTA_LIMIT,
+    SIMILAR_NUM_PERM,
+)
+from recipes.models import Recipes, RecipesIngredient
+
+logger = logging.getLogger(__name__)
+# Слияние журнала переписывает весь файл, в запросе ему не место.
+compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='similar')
+
+# Формат файла: заголовок, затем id рецептов по возрастанию, ключи полос
+# LSH по возрастанию внутри полосы, подписи MinHash и номера рецептов
+# для ключей полос. Все смещения кратны восьми байтам.
+MAGIC = int.from_bytes(b'MINHASH1', 'little')
+HEADER_SIZE = 64
+ROWS = SIMILAR_NUM_PERM // SIMILAR_BANDS
+PRIME = (1 << 31) - 1
+# RandomState выдаёт одну и ту же последовательность во всех версиях
+# NumPy, подписи из файла и новые подписи считаются одними функциями.
+_random = np.random.RandomState(20240601)
+HASH_A = _random.randint(1, PRIME, SIMILAR_NUM_PERM).astype(np.uint64)
+HASH_B = _random.randint(0, PRIME, SIMILAR_NUM_PERM).astype(np.uint64)
+BAND_MULTIPLIERS = (
+    _random.randint(1, 1 << 62, ROWS, dtype=np.int64).astype(np.uint64) | 1
+)
+# Запись журнала изменений: отрицательный id — рецепт удалён из индекса.
+DELTA_DTYPE = np.dtype([
+    ('id', '<i8'), ('signature', '<u4', (SIMILAR_NUM_PERM,))
+])
+
+
+def minhash(recipe_ids, ingredient_ids):
+    # Строки отсортированы по рецепту, минимум каждой хеш-функции
+    # берётся по ингредиентам рецепта.
+    if not len(recipe_ids):
+        return (
+            np.empty(0, np.int64),
+            np.empty((0, SIMILAR_NUM_PERM), np.uint32),
+        )
+    values = (ingredient_ids % PRIME).astype(np.uint64)
+    hashes = (HASH_A[:, None] * values[None, :] + HASH_B[:, None]) % PRIME
+    starts = np.flatnonzero(np.r_[True, recipe_ids[1:] != recipe_ids[:-1]])
+    return (
+        recipe_ids[starts],
+        np.minimum.reduceat(hashes, starts, axis=1).T.astype(np.uint32),
+    )
+
+
+def compute_signatures(**lookups):
+    rows = np.array(
+        RecipesIngredient.objects.filter(
+            ingredient__isnull=False, **lookups
+        ).order_by('recipe_id').values_list('recipe_id', 'ingredient_id'),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    return minhash(rows[:, 0], rows[:, 1])
+
+
+def band_keys(signatures):
+    # Строки подписи внутри полосы сворачиваются в одно число,
+    # переполнение uint64 здесь ожидаемо.
+    bands = signatures.reshape(
+        len(signatures), SIMILAR_BANDS, ROWS
+    ).astype(np.uint64)
+    return (bands * BAND_MULTIPLIERS).sum(axis=2, dtype=np.uint64).T
+
+
+def find(ids, recipe_id):
+    position = np.searchsorted(ids, recipe_id)
+    if position < len(ids) and ids[position] == recipe_id:
+        return position
+    return None
+
+
+def file_stat(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def write_base(path, ids, signatures):
+    order = np.argsort(ids, kind='stable')
+    ids, signatures = ids[order], signatures[order]
+    keys = band_keys(signatures)
+    positions = np.argsort(keys, axis=1, kind='stable')
+    header = np.zeros(HEADER_SIZE // 8, dtype='<u8')
+    header[:4] = MAGIC, len(ids), SIMILAR_NUM_PERM, SIMILAR_BANDS
+    temporary = path.with_name(path.name + '.tmp')
+    with open(temporary, 'wb') as file:
+        for array in (
+            header,
+            ids.astype('<i8'),
+            np.take_along_axis(keys, positions, axis=1).astype('<u8'),
+            signatures.astype('<u4'),
+            positions.astype('<u4'),
+        ):
+            np.ascontiguousarray(array).tofile(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+class BaseIndex:
+    def __init__(self, path):
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        header = buffer[:HEADER_SIZE].view('<u8')
+        if (
+            header[0] != MAGIC
+            or header[2] != SIMILAR_NUM_PERM
+            or header[3] != SIMILAR_BANDS
+        ):
+            raise ValueError(f'{path} построен с другими параметрами.')
+        count = int(header[1])
+        offset = HEADER_SIZE
+        sections = []
+        for dtype, shape in (
+            ('<i8', (count,)),
+            ('<u8', (SIMILAR_BANDS, count)),
+            ('<u4', (count, SIMILAR_NUM_PERM)),
+            ('<u4', (SIMILAR_BANDS, count)),
+        ):
+            size = np.dtype(dtype).itemsize * int(np.prod(shape))
+            sections.append(
+                buffer[offset:offset + size].view(dtype).reshape(shape)
+            )
+            offset += size
+        self.ids, self.keys, self.signatures, self.positions = sections
+
+    def candidates(self, keys):
+        positions = [
+            self.positions[band, start:end]
+            for band, key in enumerate(keys)
+            for start, end in [(
+                np.searchsorted(self.keys[band], key, 'left'),
+                np.searchsorted(self.keys[band], key, 'right'),
+            )]
+            if start < end
+        ]
+        if not positions:
+            return np.empty(0, np.int64)
+        return np.unique(np.concatenate(positions)).astype(np.int64)
+
+
+class DeltaIndex:
+    def __init__(self, path):
+        data = Path(path).read_bytes()
+        records = np.frombuffer(
+            data[:len(data) - len(data) % DELTA_DTYPE.itemsize],
+            dtype=DELTA_DTYPE,
+        )[::-1]
+        # Действует последняя запись о рецепте.
+        self.changed, first = np.unique(
+            np.abs(records['id']), return_index=True
+        )
+        latest = records[first]
+        latest = latest[latest['id'] > 0]
+        self.ids = latest['id']
+        self.signatures = latest['signature']
+        self.keys = band_keys(self.signatures)
+
+
+class SimilarRecipesIndex:
+    # Основной файл пересобирается командой similar_index, изменения
+    # рецептов дописываются в журнал рядом. Журнал сливается с основным
+    # файлом в фоновом потоке, когда в нём набирается SIMILAR_DELTA_LIMIT
+    # записей.
+    def __init__(self):
+        self.lock = Lock()
+        self.state = (None, None)
+        self.stats = (None, None)
+        self.compacting = False
+
+    @property
+    def path(self):
+        return Path(settings.SIMILAR_RECIPES_INDEX)
+
+    @property
+    def delta_path(self):
+        return self.path.with_name(self.path.name + '.delta')
+
+    @contextmanager
+    def locked(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(self.path.name + '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read(self, path, index_class, stat):
+        if stat is None:
+            return None
+        try:
+            return index_class(path)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def ensure_actual(self):
+        stats = file_stat(self.path), file_stat(self.delta_path)
+        if stats == self.stats:
+            return self.state
+        with self.lock:
+            if stats != self.stats:
+                base, delta = self.state
+                if stats[0] != self.stats[0]:
+                    base = self.read(self.path, BaseIndex, stats[0])
+                if stats[1] != self.stats[1]:
+                    delta = self.read(self.delta_path, DeltaIndex, stats[1])
+                self.state, self.stats = (base, delta), stats
+        return self.state
+
+    def signature(self, base, delta, recipe_id):
+        if delta is not None and find(delta.changed, recipe_id) is not None:
+            position = find(delta.ids, recipe_id)
+            return None if position is None else delta.signatures[position]
+        if base is not None:
+            position = find(base.ids, recipe_id)
+            if position is not None:
+                return base.signatures[position]
+        ids, signatures = compute_signatures(recipe_id=recipe_id)
+        return signatures[0] if len(ids) else None
+
+    def similar(self, recipe_id, limit):
+        base, delta = self.ensure_actual()
+        signature = self.signature(base, delta, recipe_id)
+        if signature is None or not limit:
+            return []
+        keys = band_keys(signature[None, :])[:, 0]
+        ids = [np.empty(0, np.int64)]
+        signatures = [np.empty((0, SIMILAR_NUM_PERM), np.uint32)]
+        if base is not None:
+            positions = base.candidates(keys)
+            if delta is not None:
+                positions = positions[
+                    ~np.isin(base.ids[positions], delta.changed)
+                ]
+            ids.append(base.ids[positions])
+            signatures.append(base.signatures[positions])
+        if delta is not None:
+            matched = (delta.keys == keys[:, None]).any(axis=0)
+            ids.append(delta.ids[matched])
+            signatures.append(delta.signatures[matched])
+        ids, signatures = np.concatenate(ids), np.concatenate(signatures)
+        other = ids != recipe_id
+        ids, signatures = ids[other], signatures[other]
+        # Доля совпавших минимумов — оценка коэффициента Жаккара.
+        scores = (signatures == signature).mean(axis=1)
+        top = np.lexsort((-ids, -scores))[:limit]
+        return [int(pk) for pk in ids[top]]
+
+    def update(self, recipe_ids):
+        recipe_ids = np.unique(np.array(list(recipe_ids), dtype=np.int64))
+        ids, signatures = compute_signatures(recipe_id__in=recipe_ids)
+        records = np.zeros(len(recipe_ids), dtype=DELTA_DTYPE)
+        records['id'] = -recipe_ids
+        positions = np.searchsorted(recipe_ids, ids)
+        records['id'][positions] = ids
+        records['signature'][positions] = signatures
+        with self.locked():
+            with open(self.delta_path, 'ab') as delta:
+                records.tofile(delta)
+                size = delta.tell()
+        if size // DELTA_DTYPE.itemsize > SIMILAR_DELTA_LIMIT:
+            self.schedule_compaction()
+
+    def schedule_compaction(self):
+        with self.lock:
+            if self.compacting:
+                return
+            self.compacting = True
+        compactor.submit(self.run_compaction)
+
+    def run_compaction(self):
+        try:
+            self.compact()
+        except Exception:
+            logger.exception('Не удалось слить журнал похожих рецептов')
+        finally:
+            with self.lock:
+                self.compacting = False
+
+    def compact(self):
+        with self.locked():
+            delta = self.read(
+                self.delta_path, DeltaIndex, file_stat(self.delta_path)
+            )
+            if delta is None:
+                return
+            base = self.read(self.path, BaseIndex, file_stat(self.path))
+            ids, signatures = [delta.ids], [delta.signatures]
+            if base is not None:
+                kept = ~np.isin(base.ids, delta.changed)
+                ids.append(base.ids[kept])
+                signatures.append(base.signatures[kept])
+            write_base(
+                self.path, np.concatenate(ids), np.concatenate(signatures)
+            )
+            os.unlink(self.delta_path)
+
+    def rebuild(self, batch_size):
+        # Записи журнала, появившиеся во время сборки, переживают её.
+        with self.locked():
+            offset = (file_stat(self.delta_path) or (0, 0, 0))[2]
+        recipe_ids = list(
+            Recipes.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        ids, signatures = [np.empty(0, np.int64)], [
+            np.empty((0, SIMILAR_NUM_PERM), np.uint32)
+        ]
+        for start in range(0, len(recipe_ids), batch_size):
+            batch = recipe_ids[start:start + batch_size]
+            batch_ids, batch_signatures = compute_signatures(
+                recipe_id__gte=batch[0], recipe_id__lte=batch[-1]
+            )
+            ids.append(batch_ids)
+            signatures.append(batch_signatures)
+        ids, signatures = np.concatenate(ids), np.concatenate(signatures)
+        with self.locked():
+            write_base(self.path, ids, signatures)
+            tail = b''
+            if file_stat(self.delta_path):
+                tail = self.delta_path.read_bytes()[offset:]
+            if tail:
+                temporary = self.delta_path.with_name(
+                    self.delta_path.name + '.tmp'
+                )
+                temporary.write_bytes(tail)
+                os.replace(temporary, self.delta_path)
+            elif file_stat(self.delta_path):
+                os.unlink(self.delta_path)
+        return len(ids)
+
+    def schedule_update(self, recipe_id):
+        transaction.on_commit(lambda: self.update([recipe_id]))
+
+
+similar_index = SimilarRecipesIndex()
@@ -0,0 +1,101 @@
+import re
+
+VOWELS = 'аеиоуыэюя'
+WORD = re.compile(r'\w+')
+
+
+def endings(*groups):
+    return sorted(
+        (
+            (ending, after_a)
+            for after_a, group in groups
+            for ending in group
+        ),
+        key=lambda item: -len(item[0]),
+    )
+
+
+PERFECTIVE_GERUND = endings(
+    (True, ('в', 'вши', 'вшись')),
+    (False, ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись')),
+)
+REFLEXIVE = endings((False, ('ся', 'сь')))
+ADJECTIVE = endings((False, (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)))
+PARTICIPLE = endings(
+    (True, ('ем', 'нн', 'вш', 'ющ', 'щ')),
+    (False, ('ивш', 'ывш', 'ующ')),
+)
+VERB = endings(
+    (True, (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    )),
+    (False, (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    )),
+)
+NOUN = endings((False, (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+)))
+SUPERLATIVE = endings((False, ('ейш', 'ейше')))
+
+
+def cut(word, group):
+    for ending, after_a in group:
+        if not word.endswith(ending):
+            continue
+        rest = word[:-len(ending)]
+        if not after_a or rest.endswith(('а', 'я')):
+            return rest
+    return None
+
+
+def cut_or_keep(word, group):
+    rest = cut(word, group)
+    return word if rest is None else rest
+
+
+# Упрощённый стеммер Snowball для русского языка: без области R2
+# и словообразовательных суффиксов.
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    for position, char in enumerate(word):
+        if char in VOWELS:
+            break
+    else:
+        return word
+    prefix, rv = word[:position + 1], word[position + 1:]
+
+    rest = cut(rv, PERFECTIVE_GERUND)
+    if rest is None:
+        rv = cut_or_keep(rv, REFLEXIVE)
+        rest = cut(rv, ADJECTIVE)
+        if rest is not None:
+            rest = cut_or_keep(rest, PARTICIPLE)
+        else:
+            rest = cut(rv, VERB)
+            if rest is None:
+                rest = cut(rv, NOUN)
+    if rest is not None:
+        rv = rest
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    rv = cut_or_keep(rv, SUPERLATIVE)
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    elif rv.endswith('ь'):
+        rv = rv[:-1]
+    return prefix + rv
+
+
+def stem_text(text):
+    return [stem(word) for word in WORD.findall(text)]
@@ -1,6 +1,8 @@
-from django.urls import include, path
+from django.conf import settings
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
+from api import async_views
 from api.views import (
     TagsView,
     RecipesView,
@@ -14,14 +16,42 @@ from api.views import (
 router = DefaultRouter()
 router.register('users', UserViewSet)
 router.register('tags', TagsView, basename='tags')
-router.register('ingredients', IngredientsView, basename='recipes')
-router.register('recipes', RecipesView, basename='ingredients')
+router.register('ingredients', IngredientsView, basename='ingredients')
+router.register('recipes', RecipesView, basename='recipes')
 
 auth_patterns = [
     path('', include('djoser.urls.authtoken')),
 ]
 
+# Асинхронные обёртки встают на место представлений роутера, промахи
+# и остальные методы они передают этим же представлениям.
+ASYNC_VIEWS = {
+    'tags-list': async_views.tags_view,
+    'ingredients-list': async_views.ingredients_view,
+    'recipes-list': async_views.recipes_view,
+    'recipes-detail': async_views.recipes_view,
+}
+
+
+def with_async_views(patterns):
+    return [
+        re_path(
+            pattern.pattern.regex.pattern,
+            ASYNC_VIEWS[pattern.name](pattern.callback),
+            name=pattern.name
+        )
+        if (
+            pattern.name in ASYNC_VIEWS
+            and 'format' not in pattern.pattern.regex.groupindex
+        ) else pattern
+        for pattern in patterns
+    ]
+
+
 urlpatterns = [
     path('auth/', include(auth_patterns)),
-    path('', include(router.urls)),
+    path('', include(
+        with_async_views(router.urls) if settings.ASYNC_VIEWS
+        else router.urls
+    )),
 ]
@@ -1,20 +1,44 @@
-from random import choice
-from string import ascii_letters, digits
+from functools import partial
+from hashlib import sha1
 
+from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect
 from djoser.views import UserViewSet as DjoserUserViewSet
-from django.http import HttpResponse
+from django.core.cache import cache
+from django.db.models import OuterRef, Prefetch, Subquery
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import urlencode
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
 from rest_framework import filters, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.renderers import JSONRenderer
 from rest_framework import viewsets
 
-from api.paginators import Pagination, LimitRecipesPagination
+from api import batch
+from api.cache import (
+    RECIPES_RESPONSE,
+    TAGS_RESPONSE,
+    get_version,
+    short_link_key,
+)
+from api.ingredients_index import ingredients_index
+from api.metrics import histograms
+from api.feed import get_page
+from api.fields import FieldSelection
+from api.renderers import ORJSONRenderer
+from api.shopping_list import export_lines
+from api.similar import similar_index
+from api.paginators import (
+    FeedPagination,
+    Pagination,
+    RecipesCursorPagination,
+)
 from api.serializers import (
+    BatchRecipesSerializer,
+    SparseFieldsMixin,
     IngredientSerializer,
     TagSerializer,
     RecipesSerializer,
@@ -23,26 +47,79 @@ from api.serializers import (
     ShoppingSerializer,
     FavoriteSerializer
 )
+from foodgram_backend.constant import (
+    RESPONSE_CACHE_TIMEOUT,
+    SIMILAR_RECIPES_LIMIT,
+    SIMILAR_RECIPES_MAX_LIMIT,
+)
+from recipes.short_links import encode_short_code
 from recipes.models import (
     Ingredient,
     Tag,
     Recipes,
     ShoppingCart,
     FavoriteRecipe,
-    RecipesIngredient,
     ShortLink
 )
 
 from api.permissions import AuthorOrReadOnly
-from api.filters import IngredientFilter, RecipesFilter
+from api.filters import (
+    IngredientFilter,
+    RecipesFilter,
+    RecipesSearchFilter,
+)
 from api.permissions import AuthorOrModeratorOrReadOnly
 from users.models import User, Follow
 from api.serializers import SubscribeSerializer
 
 
-class UserViewSet(DjoserUserViewSet):
+class SparseFieldsViewMixin:
+    def get_field_selection(self):
+        if self.request.method != 'GET':
+            return None
+        return FieldSelection.from_request(self.request)
+
+    def get_serializer(self, *args, **kwargs):
+        selection = self.get_field_selection()
+        if selection is not None and issubclass(
+            self.get_serializer_class(), SparseFieldsMixin
+        ):
+            kwargs['selection'] = selection
+        return super().get_serializer(*args, **kwargs)
+
+
+class UserViewSet(SparseFieldsViewMixin, DjoserUserViewSet):
     pagination_class = Pagination
 
+    def get_queryset(self):
+        selection = self.get_field_selection()
+        if selection is not None and not selection.includes('is_subscribed'):
+            return super().get_queryset()
+        return super().get_queryset().with_is_subscribed(self.request.user)
+
+    def get_recipes_limit(self):
+        try:
+            recipes_limit = int(self.request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            return None
+        return max(recipes_limit, 0)
+
+    def get_subscriptions_queryset(self, selection=None):
+        users = User.objects.order_by('username')
+        if selection is None or selection.includes('is_subscribed'):
+            users = users.with_is_subscribed(self.request.user)
+        if selection is not None and not selection.includes('recipes'):
+            return users
+        recipes = Recipes.objects.all()
+        recipes_limit = self.get_recipes_limit()
+        if recipes_limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipes.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:recipes_limit]
+            ))
+        return users.prefetch_related(Prefetch('recipes', queryset=recipes))
+
     def make_serializer(self, instance, data, partial=True):
         return self.get_serializer(
             instance,
@@ -91,10 +168,9 @@ class UserViewSet(DjoserUserViewSet):
         serializer_class=SubscribeSerializer
     )
     def subscriptions(self, request, *args, **kwargs):
-        if 'recipes_limit' in request.query_params:
-            self.pagination_class = LimitRecipesPagination
-        queryset = User.objects.filter(
-            following__follower_id=self.request.user.pk)
+        queryset = self.get_subscriptions_queryset(
+            self.get_field_selection()
+        ).filter(following__follower_id=self.request.user.pk)
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -136,15 +212,20 @@ class UserViewSet(DjoserUserViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         Follow.objects.create(follower=subscriber, user=user)
+        user = self.get_subscriptions_queryset().get(pk=user.pk)
         serializer = SubscribeSerializer(user, context={'request': request})
-        if 'recipes_limit' in request.query_params:
-            recipe_limit = int(self.request.query_params['recipes_limit'])
-            respons_data = dict(serializer.data)
-            respons_data['recipes'] = respons_data['recipes'][:recipe_limit]
-            return Response(respons_data, status=status.HTTP_201_CREATED)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+def json_response(request, content, etag):
+    response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, no_cache=True)
+    return get_conditional_response(
+        request, etag=etag, response=response
+    ) or response
+
+
 class IngredientsView(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -154,31 +235,142 @@ class IngredientsView(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
     permission_classes = (permissions.AllowAny,)
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None or 'search' in request.query_params:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredients_index.search(name))
+
 
 class TagsView(viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     filter_backends = (DjangoFilterBackend, filters.SearchFilter)
     filterset_fields = ('name',)
-    renderer_classes = [JSONRenderer]
+    renderer_classes = [ORJSONRenderer]
     search_fields = ['^name']
     pagination_class = None
 
+    @staticmethod
+    def get_cache_key():
+        return f'{TAGS_RESPONSE}_{get_version(TAGS_RESPONSE)}'
+
+    def get_cached_content(self):
+        key = self.get_cache_key()
+        cached = cache.get(key)
+        if cached is None:
+            content = ORJSONRenderer().render(
+                self.get_serializer(self.get_queryset(), many=True).data
+            )
+            cached = (content, f'"{sha1(content).hexdigest()}"')
+            cache.set(key, cached, None)
+        return cached
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        return json_response(request, *self.get_cached_content())
 
-class RecipesView(viewsets.ModelViewSet):
+
+class RecipesView(SparseFieldsViewMixin, viewsets.ModelViewSet):
     http_method_names = 'get', 'post', 'patch', 'delete'
     permission_classes = [AuthorOrReadOnly]
     queryset = Recipes.objects.all()
     serializer_class = RecipesSerializer, RecipesPostSerializer
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
+    filter_backends = (DjangoFilterBackend, RecipesSearchFilter)
     filterset_class = RecipesFilter
-    search_fields = ('tags', 'ingredients')
+
+    @property
+    def paginator(self):
+        query_params = self.request.query_params
+        if (
+            'cursor' in query_params
+            or query_params.get('pagination') == 'cursor'
+        ):
+            self.pagination_class = RecipesCursorPagination
+        return super().paginator
+
+    def get_queryset(self):
+        return Recipes.objects.for_representation(
+            self.request.user, self.get_field_selection()
+        )
+
+    @staticmethod
+    def get_cache_key(request):
+        query = urlencode(sorted(
+            (key, sorted(values)) for key, values in request.GET.lists()
+        ), doseq=True)
+        digest = sha1(
+            f'{request.build_absolute_uri(request.path)}?{query}'.encode()
+        ).hexdigest()
+        return (
+            f'{RECIPES_RESPONSE}_{get_version(RECIPES_RESPONSE)}_{digest}'
+        )
+
+    def cached_response(self, request, render):
+        # Анонимные ответы одинаковы для всех, кешируем готовый JSON.
+        if (
+            request.user.is_authenticated
+            or request.accepted_renderer.format != 'json'
+        ):
+            return render()
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            content = ORJSONRenderer().render(render().data)
+            cached = (content, f'"{sha1(content).hexdigest()}"')
+            cache.set(key, cached, RESPONSE_CACHE_TIMEOUT)
+        return json_response(request, *cached)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, partial(super().list, request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, partial(super().retrieve, request, *args, **kwargs)
+        )
 
     def get_serializer_class(self):
         if self.request.method in ('POST', 'PATCH'):
             return RecipesPostSerializer
         return RecipesSerializer
 
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        paginator = FeedPagination()
+        ids = paginator.paginate_feed(
+            partial(get_page, request.user), request
+        )
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    def get_similar_limit(self):
+        try:
+            limit = int(self.request.query_params['limit'])
+        except (KeyError, ValueError):
+            return SIMILAR_RECIPES_LIMIT
+        return min(max(limit, 0), SIMILAR_RECIPES_MAX_LIMIT)
+
+    def get_similar(self, recipe):
+        ids = similar_index.similar(recipe.pk, self.get_similar_limit())
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True
+        )
+        return Response(serializer.data)
+
+    @action(detail=True)
+    def similar(self, request, pk):
+        recipe = get_object_or_404(Recipes.objects.only('pk'), pk=pk)
+        return self.cached_response(
+            request, partial(self.get_similar, recipe)
+        )
+
     @action(
         detail=True,
         url_path='get-link',
@@ -186,30 +378,23 @@ class RecipesView(viewsets.ModelViewSet):
         serializer_class=SubscribeSerializer
     )
     def get_link(self, request, pk, format=None):
-        full_url = request.build_absolute_uri()[:-10]
-        recipe = Recipes.objects.get(
-            pk=request.parser_context['kwargs'].get('pk')
+        recipe = get_object_or_404(Recipes.objects.only('pk'), pk=pk)
+        link, _ = ShortLink.objects.get_or_create(
+            recipe=recipe,
+            defaults={
+                'code': encode_short_code(recipe.pk),
+                'original_url': request.build_absolute_uri(
+                    f'/recipes/{recipe.pk}/'
+                ),
+            }
         )
-        obj_rec, created = ShortLink.objects.get_or_create(recipe=recipe)
-        if not created:
-            return Response({"short-link": obj_rec.short_link})
-        characters = ascii_letters + digits
-
-        while True:
-            response = ''.join(choice(characters) for _ in range(3))
-            url = request.build_absolute_uri().split(
-                '/api/')[0]
-            url = url + '/s/' + response
-            if ShortLink.objects.filter(short_link=url).exists():
-                continue
-            obj_rec.short_link = url
-            obj_rec.original_url = full_url.replace('/api', '')
-            obj_rec.save()
-            break
-        return Response({"short-link": obj_rec.short_link})
+        if link.code is None:
+            return Response({"short-link": link.short_link})
+        return Response({
+            "short-link": request.build_absolute_uri(f'/s/{link.code}')
+        })
 
     def shop_and_favorite(self, request, pk, model, serializer, item):
-        user = get_object_or_404(User, id=self.request.user.pk)
         recipe = get_object_or_404(Recipes, id=pk)
         if request.method == 'DELETE':
             rule_to_delete = model.objects.filter(
@@ -221,8 +406,8 @@ class RecipesView(viewsets.ModelViewSet):
 
         obj, created = model.objects.get_or_create(
             recipe=recipe,
-            user=user,
-            name=recipe.name,
+            user=request.user,
+            defaults={'name': recipe.name},
         )
         if created:
             serializer = serializer(obj)
@@ -265,37 +450,49 @@ class RecipesView(viewsets.ModelViewSet):
             'избранное'
         )
 
+    def batch_shop_and_favorite(self, request, model):
+        serializer = BatchRecipesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'DELETE':
+            results = batch.remove_recipes(model, request.user, recipe_ids)
+        else:
+            results = batch.add_recipes(model, request.user, recipe_ids)
+        return Response({'results': [
+            {'id': pk, 'status': result} for pk, result in results.items()
+        ]})
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart',
+        permission_classes=[IsAuthenticated]
+    )
+    def batch_shopping_cart(self, request):
+        return self.batch_shop_and_favorite(request, ShoppingCart)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite',
+        permission_classes=[IsAuthenticated]
+    )
+    def batch_favorite(self, request):
+        return self.batch_shop_and_favorite(request, FavoriteRecipe)
+
     @action(
         detail=False,
         url_path='download_shopping_cart',
         permission_classes=[IsAuthenticated]
     )
     def get_download_shopping_cart(self, request):
-        shopping = ShoppingCart.objects.select_related('recipe')
-        all_recipe = []
-        for shop in shopping:
-            all_recipe.append(shop.recipe.pk)
-        ings = RecipesIngredient.objects.select_related('ingredient')
-        some_dict = dict()
-        for i in ings:
-            if i.recipe is None or i.recipe is None:
-                continue
-            if i.recipe.pk in all_recipe:
-                some_dict.setdefault(
-                    i.ingredient.name, {}
-                ).setdefault(i.ingredient.measurement_unit, []
-                             ).append(i.amount)
-        all_str = []
-        for key, value in some_dict.items():
-            for weigt, cnt in value.items():
-                string = f'{key} {str(sum(map(int, cnt)))} {weigt}\n'
-                all_str.append(string)
-        response = HttpResponse(content_type='text/plain')
+        # Под ASGI части ответа читаются в потоке ORM, см. api.handlers.
+        response = StreamingHttpResponse(
+            export_lines(request.user), content_type='text/plain'
+        )
         response['Content-Disposition'] = (
             'attachment; filename='
             '"shopping_list.txt"')
-        for item in all_str:
-            response.write(f"{item}")
         return response
 
 
@@ -303,5 +500,27 @@ class RedirectView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request, link):
-        link = ShortLink.objects.filter(short_link__endswith=link).first()
-        return redirect(link.original_url, permanent=False)
+        # Ссылки, выданные до появления кода, хранят его только в конце
+        # short_link, пока backfill_short_links их не перенёс.
+        short_link = (
+            ShortLink.objects.filter(code=link).first()
+            or ShortLink.objects.filter(
+                code=None, short_link__endswith=f'/s/{link}'
+            ).first()
+        )
+        if short_link is None:
+            raise Http404
+        cache.set(
+            short_link_key(link),
+            short_link.original_url,
+            RESPONSE_CACHE_TIMEOUT
+        )
+        return redirect(short_link.original_url, permanent=False)
+
+
+def metrics(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(
+        histograms.render(), content_type='text/plain; version=0.0.4'
+    )
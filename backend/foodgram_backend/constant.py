@@ -11,3 +11,33 @@ LENGTH_TAG = 32
 LENGTH_ING_NAME = 128
 LENGTH_ING_MU = 64
 PAGE_SIZE = 6
+LENGTH_SHORT_CODE = 16
+SHORT_CODE_LENGTH = 6
+IMAGE_MAX_SIZE = 5 * 1024 * 1024
+IMAGE_VARIANTS = {
+    'small': (320, 320),
+    'medium': (960, 960),
+}
+IMAGE_VARIANTS_DIR = 'variants'
+IMAGE_VARIANTS_QUALITY = 80
+SEARCH_RESULTS_LIMIT = 500
+METRICS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+METRICS_FLUSH_INTERVAL = 10
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 300
+ADMIN_EXACT_COUNT_LIMIT = 10000
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+FEED_FANOUT_LIMIT = 10000
+FEED_BACKFILL_LIMIT = 50
+BATCH_RECIPES_LIMIT = 100
+COMPRESSION_MIN_LENGTH = 512
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+COMPRESSION_CACHE_SIZE = 256
+SIMILAR_NUM_PERM = 128
+SIMILAR_BANDS = 32
+SIMILAR_DELTA_LIMIT = 1000
+SIMILAR_RECIPES_LIMIT = 6
+SIMILAR_RECIPES_MAX_LIMIT = 50
@@ -4,18 +4,26 @@ from django.urls import include, path
 from django.views.generic import TemplateView
 from django.contrib import admin
 
+from api.async_views import redirect_short_link
 from api.views import (
     RedirectView,
+    metrics,
 )
 
 short_link = [
-    path('<str:link>', RedirectView.as_view(), name='redirect')
+    path(
+        '<str:link>',
+        redirect_short_link if settings.ASYNC_VIEWS
+        else RedirectView.as_view(),
+        name='redirect'
+    )
 ]
 
 urlpatterns = [
     path('s/', include(short_link)),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', metrics, name='metrics'),
     path(
         'redoc/',
         TemplateView.as_view(template_name='redoc.html'),
@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from api import shopping_list
+from api.paginators import EstimatedCountPaginator
 from recipes.models import (
     Ingredient,
     Tag,
@@ -11,9 +13,16 @@ from recipes.models import (
 )
 
 
-class ShortLinkAdmin(admin.ModelAdmin):
-    list_display = ('recipe', 'short_link', 'original_url')
-    search_fields = ('recipe',)
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ShortLinkAdmin(LargeTableAdmin):
+    list_display = ('recipe', 'code', 'original_url')
+    list_select_related = ('recipe',)
+    raw_id_fields = ('recipe',)
+    search_fields = ('code', 'recipe__name')
 
 
 class IngredientAdmin(admin.ModelAdmin):
@@ -26,32 +35,51 @@ class TagAdmin(admin.ModelAdmin):
     list_filter = ('name',)
 
 
-class RecipesAdmin(admin.ModelAdmin):
+class RecipesAdmin(LargeTableAdmin):
     list_display = (
         'name',
         'author',
-        'favorites_recipe_count',
+        'favorites_count',
+        'carts_count',
     )
+    list_select_related = ('author',)
+    raw_id_fields = ('author',)
     search_fields = ('name', 'author__username', "author__first_name")
     list_filter = ('tags',)
     ordering = ('-pub_date',)
 
-    @admin.display(description='Количество в избранном')
-    def favorites_recipe_count(self, obj):
-        return FavoriteRecipe.objects.filter(recipe=obj).count()
-
 
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe')
+    raw_id_fields = ('user', 'recipe')
 
 
-class RecipesIngredientAdmin(admin.ModelAdmin):
+class RecipesIngredientAdmin(LargeTableAdmin):
     list_display = ('ingredient', 'amount')
+    list_select_related = ('ingredient',)
+    raw_id_fields = ('recipe', 'ingredient')
+
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id, form.initial.get('recipe')} - {None}
+        with shopping_list.updating(*recipe_ids):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with shopping_list.updating(obj.recipe_id):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        with shopping_list.updating(*recipe_ids - {None}):
+            super().delete_queryset(request, queryset)
 
 
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     list_display = ('user', 'recipe',)
-    search_fields = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    raw_id_fields = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
 
 
 admin.site.register(ShortLink, ShortLinkAdmin)
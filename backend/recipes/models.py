@@ -1,5 +1,6 @@
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import BooleanField, Exists, OuterRef, Prefetch, Value
 from django.contrib.auth import get_user_model
 
 from foodgram_backend.constant import (
@@ -8,8 +9,10 @@ from foodgram_backend.constant import (
     LENGTH_TAG,
     LENGTH_ING_NAME,
     LENGTH_ING_MU,
+    LENGTH_SHORT_CODE,
 )
 from recipes.core import NameModel, ShopFavorite
+from users.models import CountersModel
 
 User = get_user_model()
 
@@ -56,7 +59,66 @@ class Ingredient(NameModel):
         ordering = ['name']
 
 
-class Recipes(NameModel):
+class RecipesQuerySet(models.QuerySet):
+    def user_flags(self, user):
+        if not user.is_authenticated:
+            return {
+                'is_favorited': Value(False, output_field=BooleanField()),
+                'is_in_shopping_cart': Value(
+                    False, output_field=BooleanField()
+                ),
+            }
+        return {
+            'is_favorited': Exists(FavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            'is_in_shopping_cart': Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+        }
+
+    def with_user_flags(self, user):
+        return self.annotate(**self.user_flags(user))
+
+    def for_representation(self, user, fields=None):
+        # fields — выбор полей ответа (api.fields.FieldSelection), без него
+        # рецепт отдаётся целиком. Невыбранные поля не стоят запросов.
+        def includes(name):
+            return fields is None or fields.includes(name)
+
+        def expands(name):
+            return fields is None or fields.expands(name)
+
+        queryset = self.annotate(**{
+            name: flag for name, flag in self.user_flags(user).items()
+            if includes(name)
+        })
+        if not includes('text'):
+            queryset = queryset.defer('text')
+        if includes('author') and expands('author'):
+            author = fields and fields.nested('author')
+            queryset = queryset.prefetch_related(Prefetch(
+                'author',
+                queryset=User.objects.with_is_subscribed(user)
+                if not author or author.includes('is_subscribed')
+                else User.objects.all()
+            ))
+        if includes('tags'):
+            queryset = queryset.prefetch_related(
+                'tags' if expands('tags')
+                else Prefetch('tags', queryset=Tag.objects.only('pk'))
+            )
+        if includes('ingredients'):
+            ingredients = RecipesIngredient.objects.all()
+            if expands('ingredients'):
+                ingredients = ingredients.select_related('ingredient')
+            queryset = queryset.prefetch_related(
+                Prefetch('recipe_ingredients', queryset=ingredients)
+            )
+        return queryset
+
+
+class Recipes(CountersModel, NameModel):
     name = models.CharField(
         max_length=LENGTH_DISCRIPTION,
         verbose_name='Название',
@@ -102,12 +164,32 @@ class Recipes(NameModel):
         verbose_name='Дата добавления',
         null=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество в избранном',
+    )
+    carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество в корзинах',
+    )
+
+    objects = RecipesQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'carts_count')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
         default_related_name = 'recipes'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipes_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -144,22 +226,93 @@ class RecipesIngredient(models.Model):
 
 
 class ShoppingCart(ShopFavorite):
-    class Meta:
+    class Meta(ShopFavorite.Meta):
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзина'
         default_related_name = 'shopping_cart'
 
 
 class FavoriteRecipe(ShopFavorite):
-    class Meta:
+    class Meta(ShopFavorite.Meta):
         verbose_name = 'Избранный'
         verbose_name_plural = 'Избранные рецепты'
         default_related_name = 'favorite_rec'
 
 
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов в корзине'
+    )
+
+    class Meta:
+        unique_together = (('user', 'ingredient'),)
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Списки покупок'
+
+    def __str__(self):
+        return f'{self.user} - {self.ingredient}'
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель',
+    )
+    recipe = models.ForeignKey(
+        Recipes,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата добавления')
+
+    class Meta:
+        unique_together = (('user', 'recipe'),)
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+
 class ShortLink(models.Model):
     recipe = models.ForeignKey(Recipes, on_delete=models.CASCADE)
-    short_link = models.CharField(max_length=256, unique=True)
+    code = models.CharField(
+        max_length=LENGTH_SHORT_CODE,
+        unique=True,
+        null=True,
+        verbose_name='Код',
+    )
+    short_link = models.CharField(
+        max_length=256,
+        unique=True,
+        null=True,
+        blank=True,
+    )
     original_url = models.URLField()
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -0,0 +1,25 @@
+from string import ascii_letters, digits
+
+from foodgram_backend.constant import SHORT_CODE_LENGTH
+
+ALPHABET = digits + ascii_letters
+BASE = len(ALPHABET)
+SPACE = BASE ** SHORT_CODE_LENGTH
+# Множитель взаимно прост с 62, поэтому перемешивание обратимо.
+MULTIPLIER = 1580030173
+SHIFT = 917488
+
+
+def scramble(number):
+    if number >= SPACE:
+        return number
+    return (number * MULTIPLIER + SHIFT) % SPACE
+
+
+def encode_short_code(number):
+    number = scramble(number)
+    chars = []
+    while number:
+        number, rest = divmod(number, BASE)
+        chars.append(ALPHABET[rest])
+    return ''.join(reversed(chars)).rjust(SHORT_CODE_LENGTH, ALPHABET[0])
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-from recipes.models import Recipes
+from api.paginators import EstimatedCountPaginator
 from users.models import User, Follow
 
 
@@ -10,27 +10,25 @@ class UserAdmin(BaseUserAdmin):
         'username',
         'email',
         'first_name',
-        'follow_count',
-        'recipe_count',
+        'followers_count',
+        'following_count',
+        'recipes_count',
     )
     search_fields = ('username', 'email', 'first_name')
     add_fieldsets = BaseUserAdmin.add_fieldsets
     fieldsets = BaseUserAdmin.fieldsets
-
-    @admin.display(description='Количество в подписчиков')
-    def follow_count(self, obj):
-        return Follow.objects.filter(user=obj).count()
-
-    @admin.display(description='Количество в рецептов')
-    def recipe_count(self, obj):
-        return Recipes.objects.filter(author=obj).count()
-
-
-class FollowAdmin(BaseUserAdmin):
-    list_display = ['id', 'user', 'follower']
-    filter_horizontal = []
-    ordering = ['id']
-    list_filter = ['id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'follower', 'created_at']
+    list_select_related = ['user', 'follower']
+    raw_id_fields = ['user', 'follower']
+    search_fields = ['user__username', 'follower__username']
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Follow, FollowAdmin)
@@ -1,7 +1,11 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import (
+    AbstractUser,
+    UserManager as BaseUserManager,
+)
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import BooleanField, Exists, OuterRef, Value
 
 from foodgram_backend.constant import (
     LENGTH_ROLE,
@@ -12,7 +16,42 @@ from foodgram_backend.constant import (
 )
 
 
-class User(AbstractUser):
+class UserQuerySet(models.QuerySet):
+    def with_is_subscribed(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_subscribed=Value(False, output_field=BooleanField())
+            )
+        return self.annotate(
+            is_subscribed=Exists(Follow.objects.filter(
+                user=OuterRef('pk'), follower=user
+            ))
+        )
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
+
+
+class CountersModel(models.Model):
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # Счётчики меняются только через F(), полное сохранение объекта
+        # не должно затирать их устаревшими значениями.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CountersModel, AbstractUser):
     class Role(models.TextChoices):
         USER = 'user', 'Пользователь'
         ADMIN = 'admin', 'Администратор'
@@ -52,6 +91,25 @@ class User(AbstractUser):
         verbose_name='Фамилия',
         help_text='Фамилия'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписок',
+    )
+
+    objects = UserManager()
+
+    counter_fields = ('recipes_count', 'followers_count', 'following_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -0,0 +1,93 @@
+from importlib import import_module
+
+import pytest
+from django.db import connection
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+
+from recipes.models import Ingredient, Recipes, RecipesIngredient, Tag
+from users.models import User
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker):
+    # Тесты идут без миграций, а таблицу поиска создаёт только миграция.
+    migration = import_module('api.migrations.0001_recipes_search')
+    with django_db_blocker.unblock(), connection.schema_editor() as editor:
+        migration.create_search_table(None, editor)
+
+
+@pytest.fixture(autouse=True)
+def isolated_environment(settings, tmp_path):
+    # Кеши и индекс похожих рецептов не переживают тест. Кеш общий,
+    # как в compose, иначе кеш токенов отключается.
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(tmp_path / 'cache'),
+    }}
+    settings.PASSWORD_HASHERS = [
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ]
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    settings.SIMILAR_RECIPES_INDEX = tmp_path / 'similar_recipes.idx'
+    token_cache.entries.clear()
+
+
+@pytest.fixture
+def make_user(db):
+    def make(username):
+        return User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='password',
+            first_name=username,
+            last_name=username,
+        )
+    return make
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user('user')
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}'
+    )
+    return client
+
+
+@pytest.fixture
+def tag(db):
+    return Tag.objects.create(name='Завтрак', slug='breakfast')
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(
+            name=f'ингредиент {index}', measurement_unit='г'
+        )
+        for index in range(10)
+    ]
+
+
+@pytest.fixture
+def make_recipe(tag, ingredients):
+    def make(author, amounts=None, name='рецепт'):
+        # amounts — количество по номеру ингредиента из фикстуры.
+        recipe = Recipes.objects.create(
+            author=author, name=name, text='текст', cooking_time=10
+        )
+        recipe.tags.add(tag)
+        for index, amount in (amounts or {0: 100, 1: 2}).items():
+            RecipesIngredient.objects.create(
+                recipe=recipe, ingredient=ingredients[index], amount=amount
+            )
+        return recipe
+    return make
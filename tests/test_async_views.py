@@ -0,0 +1,24 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+
+
+@pytest.mark.django_db
+def test_cache_miss_runs_middleware_chain(tag):
+    client = AsyncClient()
+    miss = async_to_sync(client.get)('/api/tags/')
+    hit = async_to_sync(client.get)('/api/tags/')
+    assert miss.status_code == hit.status_code == 200
+    assert miss.content == hit.content
+    assert hasattr(miss.asgi_request, 'session')
+    assert not hasattr(hit.asgi_request, 'session')
+    assert hit['X-Frame-Options'] == 'DENY'
+
+
+@pytest.mark.django_db
+def test_browsable_api_runs_middleware_chain(tag):
+    response = async_to_sync(AsyncClient().get)(
+        '/api/tags/', HTTP_ACCEPT='text/html'
+    )
+    assert response.status_code == 200
+    assert hasattr(response.asgi_request, 'session')
@@ -0,0 +1,55 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Сам /api/users/me/ делает один запрос, ещё один — проверка токена.
+CACHED, UNCACHED = 1, 2
+
+
+def queries(client, url='/api/users/me/'):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    return response, len(context.captured_queries)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_other_users_changes_keep_cached_tokens(user, user_client, make_user):
+    user_client.get('/api/users/me/')
+    other = make_user('other')
+    other.first_name = 'Другой'
+    other.save()
+    response, count = queries(user_client)
+    assert response.status_code == 200
+    assert count == CACHED
+
+
+@pytest.mark.django_db(transaction=True)
+def test_user_changes_invalidate_own_tokens(user, user_client):
+    user_client.get('/api/users/me/')
+    user.first_name = 'Новое'
+    user.save()
+    response, count = queries(user_client)
+    assert response.json()['first_name'] == 'Новое'
+    assert count == UNCACHED
+    user.is_active = False
+    user.save()
+    assert user_client.get('/api/users/me/').status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+def test_logout_revokes_cached_token(user, user_client):
+    assert user_client.get('/api/users/me/').status_code == 200
+    response = user_client.post('/api/auth/token/logout/')
+    assert response.status_code == 204
+    assert user_client.get('/api/users/me/').status_code == 401
+
+
+@pytest.mark.django_db
+def test_tokens_are_not_cached_without_shared_cache(settings, user_client):
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }}
+    user_client.get('/api/users/me/')
+    response, count = queries(user_client)
+    assert response.status_code == 200
+    assert count == UNCACHED
@@ -0,0 +1,21 @@
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from api.compression import compress_response
+
+BODY = 'рецепт ' * 500
+
+
+@pytest.mark.parametrize('content_type, compressed', [
+    ('application/json', True),
+    ('text/plain; charset=utf-8', True),
+    ('text/html; charset=utf-8', False),
+    ('text/css', False),
+])
+def test_only_api_payloads_are_compressed(content_type, compressed):
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+    response = compress_response(
+        request, HttpResponse(BODY, content_type=content_type)
+    )
+    assert (response.get('Content-Encoding') == 'br') is compressed
@@ -0,0 +1,92 @@
+import pytest
+from django.db import IntegrityError, transaction
+
+from api import batch
+from api.counters import reconcile_counters
+from recipes.models import FavoriteRecipe, Recipes, ShoppingCart
+from users.models import Follow, User
+
+
+@pytest.mark.django_db
+def test_counters_follow_inserts_and_deletes(user, make_user, make_recipe):
+    author = make_user('author')
+    recipe = make_recipe(author)
+    favorite = FavoriteRecipe.objects.create(user=user, recipe=recipe)
+    Follow.objects.create(user=author, follower=user)
+    author.refresh_from_db()
+    recipe.refresh_from_db()
+    assert (author.recipes_count, author.followers_count) == (1, 1)
+    assert recipe.favorites_count == 1
+    favorite.delete()
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 0
+
+
+@pytest.mark.django_db
+def test_stale_counter_does_not_go_negative(user, make_user, make_recipe):
+    author = make_user('author')
+    recipe = make_recipe(author)
+    favorite = FavoriteRecipe.objects.create(user=user, recipe=recipe)
+    follow = Follow.objects.create(user=author, follower=user)
+    # Строки, созданные до появления столбцов, достались с нулями.
+    Recipes.objects.update(favorites_count=0)
+    User.objects.update(followers_count=0, following_count=0)
+    favorite.delete()
+    follow.delete()
+    recipe.delete()
+    author.refresh_from_db()
+    assert (author.recipes_count, author.followers_count) == (0, 0)
+
+
+@pytest.mark.django_db
+def test_reconcile_counters_backfills(user, make_user, make_recipe):
+    author = make_user('author')
+    recipe = make_recipe(author)
+    FavoriteRecipe.objects.create(user=user, recipe=recipe)
+    Recipes.objects.update(favorites_count=0)
+    User.objects.update(recipes_count=0)
+    assert reconcile_counters(dry_run=True)['Recipes.favorites_count'] == 1
+    reconcile_counters()
+    recipe.refresh_from_db()
+    author.refresh_from_db()
+    assert (recipe.favorites_count, author.recipes_count) == (1, 1)
+    assert not any(reconcile_counters(dry_run=True).values())
+
+
+@pytest.mark.django_db
+def test_batch_counts_only_inserted_rows(
+    user, user_client, make_user, make_recipe
+):
+    author = make_user('author')
+    recipes = [make_recipe(author) for _ in range(3)]
+    url = f'/api/recipes/{recipes[0].pk}/favorite/'
+    assert user_client.post(url).status_code == 201
+    assert user_client.post(url).status_code == 400
+    response = user_client.post(
+        '/api/recipes/favorite/',
+        {'recipes': [recipe.pk for recipe in recipes]},
+        format='json',
+    )
+    assert [result['status'] for result in response.json()['results']] == [
+        'exists', 'added', 'added',
+    ]
+    assert FavoriteRecipe.objects.filter(user=user).count() == 3
+    assert list(Recipes.objects.order_by('pk').values_list(
+        'favorites_count', flat=True
+    )) == [1, 1, 1]
+
+
+@pytest.mark.django_db
+def test_cart_and_favorite_pairs_are_unique(
+    user, make_user, make_recipe, monkeypatch
+):
+    recipe = make_recipe(make_user('author'))
+    for model in (ShoppingCart, FavoriteRecipe):
+        model.objects.create(user=user, recipe=recipe, name=recipe.name)
+        with pytest.raises(IntegrityError), transaction.atomic():
+            model.objects.create(user=user, recipe=recipe, name=recipe.name)
+        # Строку вставил параллельный запрос уже после проверки.
+        monkeypatch.setattr(batch, 'user_recipe_ids', lambda *args: set())
+        batch.add_recipes(model, user, [recipe.pk])
+        monkeypatch.undo()
+        assert model.objects.filter(user=user, recipe=recipe).count() == 1
@@ -0,0 +1,28 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import FeedEntry
+from users.models import Follow
+
+
+def feed(client):
+    response = client.get('/api/recipes/feed/')
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+@pytest.mark.django_db
+def test_rebuild_feed_fills_timelines_of_existing_follows(
+    user, user_client, make_user, make_recipe
+):
+    author = make_user('author')
+    recipes = [make_recipe(author) for _ in range(3)]
+    make_recipe(make_user('stranger'))
+    Follow.objects.create(user=author, follower=user)
+    # Подписка старше таблицы лент: записей для неё нет.
+    FeedEntry.objects.all().delete()
+    assert feed(user_client) == []
+    call_command('rebuild_feed', stdout=StringIO())
+    assert feed(user_client) == [recipe.pk for recipe in reversed(recipes)]
@@ -0,0 +1,66 @@
+from io import BytesIO, StringIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from PIL import Image
+
+from api.images import has_variants, process_image
+from recipes.models import Recipes
+
+
+def jpeg(quality):
+    buffer = BytesIO()
+    Image.radial_gradient('L').convert('RGB').save(
+        buffer, format='JPEG', quality=quality
+    )
+    return buffer.getvalue()
+
+
+def test_processing_keeps_jpeg_quality():
+    name = default_storage.save('recipes/images/photo.jpg', ContentFile(
+        jpeg(95)
+    ))
+    original = Image.open(default_storage.open(name)).quantization
+    process_image(name)
+    assert Image.open(default_storage.open(name)).quantization == original
+    assert has_variants(name)
+
+
+@pytest.mark.django_db
+def test_process_images_builds_missing_variants(user, make_recipe):
+    recipe = make_recipe(user)
+    name = default_storage.save('recipes/images/old.jpg', ContentFile(
+        jpeg(90)
+    ))
+    # Изображение загружено до появления вариантов.
+    Recipes.objects.filter(pk=recipe.pk).update(image=name)
+    assert not has_variants(name)
+    output = StringIO()
+    call_command('process_images', stdout=output)
+    assert has_variants(name)
+    assert 'Обработано изображений: 1, с ошибками: 0' in output.getvalue()
+    call_command('process_images', stdout=output)
+    assert 'Обработано изображений: 0' in output.getvalue()
+
+
+@pytest.mark.django_db
+def test_variants_fall_back_to_original_until_processed(
+    user, user_client, make_recipe
+):
+    recipe = make_recipe(user)
+    name = default_storage.save('recipes/images/new.jpg', ContentFile(
+        jpeg(90)
+    ))
+    Recipes.objects.filter(pk=recipe.pk).update(image=name)
+
+    def variants():
+        return user_client.get(f'/api/recipes/{recipe.pk}/').json()[
+            'image_variants'
+        ]
+
+    original = f'http://testserver{default_storage.url(name)}'
+    assert set(variants().values()) == {original}
+    process_image(name)
+    assert original not in variants().values()
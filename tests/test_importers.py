@@ -0,0 +1,33 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from api.importers import iter_json_array
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1024])
+@pytest.mark.parametrize('content, expected', [
+    ('[]', []),
+    (' [ 12345 , {"a": [1, 2]}, "x,]" ] ', [12345, {'a': [1, 2]}, 'x,]']),
+])
+def test_json_array_is_read_in_chunks(content, expected, chunk_size):
+    assert list(iter_json_array(StringIO(content), chunk_size)) == expected
+
+
+@pytest.mark.parametrize('content', [
+    '[,,1]', '[1,]', '[,]', '[1,,2]', '[1 2]', '[1', '{}',
+])
+def test_malformed_json_array_fails(content):
+    with pytest.raises(ValueError):
+        list(iter_json_array(StringIO(content), 2))
+
+
+@pytest.mark.django_db
+def test_adding_rejects_malformed_file(tmp_path):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(
+        '[{"name": "соль", "measurement_unit": "г"},]', encoding='utf-8'
+    )
+    with pytest.raises(CommandError):
+        call_command('adding', path, stdout=StringIO())
@@ -0,0 +1,33 @@
+from django.test import Client
+
+from api.metrics import Histograms
+
+
+def test_metrics_sum_workers_snapshots():
+    first, second = Histograms('first'), Histograms('second')
+    for _ in range(3):
+        first.observe(('recipes-list', 'GET'), 0.01, 2)
+        second.observe(('recipes-list', 'GET'), 0.01, 2)
+        second.increment('token_cache_hits')
+    # Повторный сброс пишет снимок, а не прибавляет его ещё раз.
+    first.flush()
+    first.flush()
+    second.flush()
+    metrics = Histograms('reader').render()
+    assert (
+        'foodgram_request_duration_seconds_count'
+        '{view="recipes-list",method="GET"} 6'
+    ) in metrics
+    assert (
+        'foodgram_request_queries_total'
+        '{view="recipes-list",method="GET"} 12'
+    ) in metrics
+    assert 'foodgram_token_cache_hits_total 3' in metrics
+
+
+def test_metrics_endpoint_includes_own_requests(db):
+    client = Client()
+    client.get('/api/tags/')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert 'view="tags-list",method="GET"' in response.content.decode()
@@ -0,0 +1,79 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import FavoriteRecipe, Recipes, ShoppingCart
+from users.models import Follow
+
+
+@pytest.fixture
+def catalogue(user, make_user, make_recipe):
+    authors = [make_user(f'author{index}') for index in range(12)]
+    for author in authors[::2]:
+        Follow.objects.create(user=author, follower=user)
+    for index in range(60):
+        recipe = make_recipe(authors[index % 12], {index % 9: 5, 9: 1})
+        if index % 3 == 0:
+            FavoriteRecipe.objects.create(user=user, recipe=recipe)
+        if index % 4 == 0:
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries), response.json()
+
+
+@pytest.mark.parametrize('authenticated', [False, True])
+def test_recipes_page_queries_do_not_depend_on_page_size(
+    catalogue, user_client, authenticated
+):
+    client = user_client if authenticated else APIClient()
+    # Первый запрос прогревает кеш токенов и индексы.
+    client.get('/api/recipes/?limit=2')
+    small, small_page = count_queries(client, '/api/recipes/?limit=1')
+    large, large_page = count_queries(client, '/api/recipes/?limit=50')
+    assert len(small_page['results']) == 1
+    assert len(large_page['results']) == 50
+    assert small == large
+    results = large_page['results']
+    for flag in ('is_favorited', 'is_in_shopping_cart'):
+        assert any(recipe[flag] for recipe in results) is authenticated
+    assert any(
+        recipe['author']['is_subscribed'] for recipe in results
+    ) is authenticated
+    assert all(recipe['tags'] and recipe['ingredients'] for recipe in results)
+
+
+@pytest.mark.django_db
+def test_cursor_pagination_walks_ties_by_id(user, make_user, make_recipe):
+    author, other = make_user('author'), make_user('other')
+    recipes = [
+        make_recipe(author if index % 3 else other) for index in range(14)
+    ]
+    # Одинаковая дата у всех рецептов: порядок держится только на id.
+    Recipes.objects.update(pub_date=recipes[0].pub_date)
+    client = APIClient()
+    url = f'/api/recipes/?pagination=cursor&limit=4&author={author.pk}'
+    seen = []
+    while url:
+        with CaptureQueriesContext(connection) as context:
+            page = client.get(url).json()
+        sql = ' '.join(query['sql'] for query in context.captured_queries)
+        assert 'OFFSET' not in sql and 'COUNT(' not in sql
+        assert page['previous'] is None
+        seen += [recipe['id'] for recipe in page['results']]
+        url = page['next']
+    assert seen == sorted(
+        (recipe.pk for recipe in recipes if recipe.author == author),
+        reverse=True,
+    )
+
+
+@pytest.mark.django_db
+def test_cursor_pagination_rejects_broken_cursor():
+    response = APIClient().get('/api/recipes/?cursor=broken')
+    assert response.status_code == 404
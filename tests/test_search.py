@@ -0,0 +1,34 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from recipes.models import Recipes
+
+
+def search(client, query):
+    response = client.get('/api/recipes/', {'search': query})
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+@pytest.mark.django_db
+def test_search_index_command_indexes_existing_recipes(
+    user, user_client, make_recipe
+):
+    # Рецепт создан до индекса: обновление по on_commit не сработало.
+    recipe = make_recipe(user, name='Борщ украинский')
+    make_recipe(user, name='Оладьи')
+    assert search(user_client, 'борщ') == []
+    call_command('search_index', stdout=StringIO())
+    assert search(user_client, 'борщ') == [recipe.pk]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_seeded_recipes_are_indexed_with_ingredients():
+    call_command('addiddqd', stdout=StringIO())
+    recipe = Recipes.objects.order_by('pk').first()
+    ingredient = recipe.recipe_ingredients.first().ingredient
+    client = APIClient()
+    client.force_authenticate(recipe.author)
+    assert recipe.pk in search(client, ingredient.name)
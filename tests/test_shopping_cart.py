@@ -0,0 +1,204 @@
+import tracemalloc
+
+import pytest
+from asgiref.sync import async_to_sync
+from rest_framework.authtoken.models import Token
+
+from api.shopping_list import reconcile_shopping_lists
+from recipes.models import ShoppingCart, ShoppingListItem
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+
+
+def download(client):
+    response = client.get(DOWNLOAD_URL)
+    assert response.status_code == 200
+    if response.streaming:
+        return b''.join(response.streaming_content).decode()
+    return response.content.decode()
+
+
+def grow_catalogue(make_user, make_recipe, start, stop):
+    # Чужие рецепты и корзины не должны влиять на выгрузку.
+    for index in range(start, stop):
+        other = make_user(f'other{index}')
+        recipe = make_recipe(other, {2: 10, 3: 5, index % 10: 7})
+        ShoppingCart.objects.create(user=other, recipe=recipe)
+
+
+@pytest.mark.django_db
+def test_download_sums_amounts_of_cart_recipes(
+    user, user_client, make_user, make_recipe
+):
+    author = make_user('author')
+    for recipe in (
+        make_recipe(author, {0: 100, 1: 2}),
+        make_recipe(author, {0: 50}),
+    ):
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+    make_recipe(author, {0: 1000})
+    assert download(user_client) == (
+        'ингредиент 0 150 г\n'
+        'ингредиент 1 2 г\n'
+    )
+
+
+@pytest.mark.django_db
+def test_download_cost_does_not_grow_with_catalogue(
+    user, user_client, make_user, make_recipe, django_assert_num_queries
+):
+    author = make_user('author')
+    for _ in range(3):
+        ShoppingCart.objects.create(
+            user=user, recipe=make_recipe(author, {0: 100, 1: 2, 4: 3})
+        )
+    measured = []
+    for start, stop in ((0, 5), (5, 50)):
+        grow_catalogue(make_user, make_recipe, start, stop)
+        download(user_client)
+        with django_assert_num_queries(1) as context:
+            tracemalloc.start()
+            content = download(user_client)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        measured.append((len(context.captured_queries), peak))
+        assert content.count('\n') == 3
+    (small_queries, small_peak), (large_queries, large_peak) = measured
+    assert small_queries == large_queries
+    assert large_peak < small_peak * 1.5 + 16 * 1024
+
+
+def shopping_list(user):
+    return dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient__name', 'amount'
+    ))
+
+
+def assert_consistent():
+    assert not any(reconcile_shopping_lists(dry_run=True).values())
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user('author')
+
+
+@pytest.mark.django_db
+def test_shopping_list_follows_cart_add_and_remove(user, author, make_recipe):
+    first = make_recipe(author, {0: 100, 1: 2})
+    second = make_recipe(author, {0: 50, 2: 3})
+    ShoppingCart.objects.create(user=user, recipe=first)
+    cart = ShoppingCart.objects.create(user=user, recipe=second)
+    assert shopping_list(user) == {
+        'ингредиент 0': 150, 'ингредиент 1': 2, 'ингредиент 2': 3,
+    }
+    assert_consistent()
+    cart.delete()
+    assert shopping_list(user) == {'ингредиент 0': 100, 'ингредиент 1': 2}
+    assert_consistent()
+
+
+@pytest.mark.django_db
+def test_shopping_list_follows_ingredient_edit(
+    user, user_client, author, make_recipe, tag, ingredients
+):
+    recipe = make_recipe(user, {0: 100, 1: 2})
+    other = make_recipe(author, {0: 10})
+    for holder in (user, author):
+        ShoppingCart.objects.create(user=holder, recipe=recipe)
+    ShoppingCart.objects.create(user=user, recipe=other)
+    response = user_client.patch(
+        f'/api/recipes/{recipe.pk}/',
+        {
+            'ingredients': [
+                {'id': ingredients[0].pk, 'amount': 30},
+                {'id': ingredients[3].pk, 'amount': 4},
+            ],
+            'tags': [tag.pk],
+        },
+        format='json',
+    )
+    assert response.status_code == 200
+    assert shopping_list(user) == {'ингредиент 0': 40, 'ингредиент 3': 4}
+    assert shopping_list(author) == {'ингредиент 0': 30, 'ингредиент 3': 4}
+    assert_consistent()
+
+
+@pytest.mark.django_db
+def test_shopping_list_follows_recipe_cascade(user, author, make_recipe):
+    kept = make_recipe(author, {0: 100})
+    deleted = make_recipe(author, {0: 50, 1: 2})
+    for recipe in (kept, deleted):
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+    deleted.delete()
+    assert shopping_list(user) == {'ингредиент 0': 100}
+    author.delete()
+    assert shopping_list(user) == {}
+    assert_consistent()
+
+
+@pytest.mark.django_db
+def test_shopping_list_follows_batch(user, user_client, author, make_recipe):
+    recipes = [make_recipe(author, {0: 10, index: 1}) for index in (1, 2, 3)]
+    ShoppingCart.objects.create(user=user, recipe=recipes[0])
+    url = '/api/recipes/shopping_cart/'
+    ids = [recipe.pk for recipe in recipes]
+    response = user_client.post(url, {'recipes': ids}, format='json')
+    assert [result['status'] for result in response.json()['results']] == [
+        'exists', 'added', 'added',
+    ]
+    assert shopping_list(user) == {
+        'ингредиент 0': 30,
+        'ингредиент 1': 1, 'ингредиент 2': 1, 'ингредиент 3': 1,
+    }
+    assert_consistent()
+    response = user_client.delete(url, {'recipes': ids[:2]}, format='json')
+    assert response.status_code == 200
+    assert shopping_list(user) == {'ингредиент 0': 10, 'ингредиент 3': 1}
+    assert_consistent()
+
+
+@pytest.mark.django_db
+def test_reconcile_fills_lists_of_existing_carts(user, author, make_recipe):
+    old = make_recipe(author, {0: 100, 1: 2})
+    new = make_recipe(author, {0: 50})
+    ShoppingCart.objects.create(user=user, recipe=old)
+    # Корзина старше таблицы списков: строки появятся только при деплое.
+    ShoppingListItem.objects.all().delete()
+    assert reconcile_shopping_lists()['missing'] == 2
+    ShoppingCart.objects.create(user=user, recipe=new)
+    ShoppingCart.objects.get(recipe=old).delete()
+    assert shopping_list(user) == {'ингредиент 0': 50}
+    assert_consistent()
+
+
+@pytest.mark.django_db
+def test_download_streams_under_asgi(user, make_user, make_recipe):
+    from foodgram_backend.asgi import application
+
+    token = Token.objects.create(user=user)
+    ShoppingCart.objects.create(
+        user=user, recipe=make_recipe(make_user('author'), {0: 100})
+    )
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    async_to_sync(application)({
+        'type': 'http',
+        'method': 'GET',
+        'path': DOWNLOAD_URL,
+        'query_string': b'',
+        'headers': [
+            (b'host', b'testserver'),
+            (b'authorization', f'Token {token}'.encode()),
+        ],
+    }, receive, send)
+    assert messages[0]['status'] == 200
+    assert b''.join(
+        message.get('body', b'') for message in messages[1:]
+    ) == 'ингредиент 0 100 г\n'.encode()
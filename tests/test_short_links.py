@@ -0,0 +1,45 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from recipes.models import ShortLink
+
+
+@pytest.fixture
+def legacy_link(user, make_recipe):
+    recipe = make_recipe(user)
+    return ShortLink.objects.create(
+        recipe=recipe,
+        short_link='https://food-gramtryam.zapto.org/s/aB3',
+        original_url=f'https://food-gramtryam.zapto.org/recipes/{recipe.pk}/',
+    )
+
+
+@pytest.mark.django_db
+def test_new_links_redirect(user, make_recipe):
+    recipe = make_recipe(user)
+    client = APIClient()
+    url = client.get(f'/api/recipes/{recipe.pk}/get-link/').json()[
+        'short-link'
+    ]
+    response = client.get(url.replace('http://testserver', ''))
+    assert response.status_code == 302
+    assert response['Location'].endswith(f'/recipes/{recipe.pk}/')
+
+
+@pytest.mark.django_db
+def test_legacy_links_redirect_before_backfill(legacy_link):
+    response = APIClient().get('/s/aB3')
+    assert response.status_code == 302
+    assert response['Location'] == legacy_link.original_url
+    assert APIClient().get('/s/B3').status_code == 404
+
+
+@pytest.mark.django_db
+def test_backfill_keeps_legacy_codes(legacy_link):
+    call_command('backfill_short_links', stdout=StringIO())
+    legacy_link.refresh_from_db()
+    assert legacy_link.code == 'aB3'
+    assert APIClient().get('/s/aB3').status_code == 302
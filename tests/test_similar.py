@@ -0,0 +1,33 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from api import similar
+from api.similar import similar_index
+
+
+@pytest.mark.django_db
+def test_compaction_runs_off_the_request_path(
+    user, make_recipe, monkeypatch
+):
+    recipes = [
+        make_recipe(user, {**dict.fromkeys(range(8), 1), index: 1})
+        for index in (8, 9)
+    ]
+    call_command('similar_index', stdout=StringIO())
+    submitted = []
+    monkeypatch.setattr(similar, 'SIMILAR_DELTA_LIMIT', 2)
+    monkeypatch.setattr(similar.compactor, 'submit', submitted.append)
+    for recipe in recipes * 2:
+        similar_index.update([recipe.pk])
+    # Журнал переполнен, но запрос только поставил слияние в очередь.
+    assert similar_index.delta_path.exists()
+    assert submitted == [similar_index.run_compaction]
+    before = similar_index.similar(recipes[0].pk, 5)
+    submitted[0]()
+    assert not similar_index.delta_path.exists()
+    assert not similar_index.compacting
+    assert similar_index.similar(recipes[0].pk, 5) == before == [
+        recipes[1].pk
+    ]